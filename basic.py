@@ -1,13 +1,32 @@
 # app_final_1912_workflow_enhanced_fixed.py
 import streamlit as st
 import pandas as pd
-import numpy as np
-import pickle, joblib, os, fnmatch, random
+import os, random
 from datetime import datetime, timedelta
 import streamlit.components.v1 as components
 import time
-import plotly.graph_objects as go
-import plotly.express as px
+from collections import Counter
+
+from data_cache import read_excel_cached
+from complaint_schema import coerce_types
+from shared_table import ComplaintTable
+from etr_engine import humanize_minutes
+from pipeline import (
+    already_scored, classify, estimate_etr as pipeline_estimate_etr, FAULT_RESULT_COLUMNS, ETR_RESULT_COLUMNS,
+)
+from result_store import ResultStore
+from complaint_table import (
+    CARD_LIMIT, DEFAULT_PAGE_SIZE as TABLE_PAGE_SIZE, FILTER_COLUMNS, SORT_COLUMNS,
+    table_frame, filter_options, filter_sort, page_count, page_slice,
+)
+from countdown import countdown_html, end_timestamp_ms, LIGHT_THEME
+from metrics import METRICS, METRICS_FILE, METRICS_PORT, inc, observe, serve_metrics, timed
+from profiling import PROFILE_MODES, WorkflowProfiler
+from deferred import Deferred
+from file_watch import FileWatcher
+from intake_service import fetch_results
+from model_registry import get_registry, reload_registry
+from hierarchy_index import HierarchyIndex, detect_columns, LEVELS as HIERARCHY_LEVELS
 
 # -------------------------
 # Project identity
@@ -33,6 +52,29 @@ ETR_NOM_MODEL_PATH = "nom_regression_model.pkl"
 ETR_ENCODERS_PATH  = "feature_encoders 1.pkl"
 HIERARCHY_PATH     = "org_hierarchy.xlsx"
 COMPLAINTS_DATA_PATH = "data.xlsx"
+
+# Animated pacing is a demo option; production runs the loops at full speed
+DEMO_PACING = os.environ.get("EOI_DEMO_PACING", "0") == "1"
+# Complaints pulled per fetch; 0 keeps the demo's random 5-8
+FETCH_SIZE = int(os.environ.get("EOI_FETCH_SIZE", "0") or 0)
+# When set, complaints are scored by intake_service.py and the dashboard only reads results
+INTAKE_SERVICE_URL = os.environ.get("EOI_INTAKE_SERVICE_URL", "")
+
+# Wall time of this script run, reported as the "rerun" stage
+RUN_STARTED = time.perf_counter()
+inc("reruns")
+
+# Profiling mode: every rerun of one workflow (until ETR completes) is recorded by one profiler
+workflow_profiler = st.session_state.get("workflow_profiler")
+if workflow_profiler is not None:
+    workflow_profiler.resume()
+
+
+def rerun():
+    """st.rerun(), pausing the workflow profiler first."""
+    if workflow_profiler is not None:
+        workflow_profiler.pause()
+    st.rerun()
 ILLU_IMAGE_PATH    = "2011.i402.058..Electricity and lighting flat composition.jpg"
 
 # -------------------------
@@ -172,134 +214,211 @@ st.markdown("""
 # -------------------------
 # Helper functions
 # -------------------------
-def parse_numeric(text):
-    if text is None: return np.nan
-    s = str(text).strip()
-    if s == "" or s.lower() in ["na","n/a","nan","-"]:
-        return np.nan
-    s = s.replace(",", "")
-    try:
-        return float(s)
-    except:
-        return np.nan
+def demo_pause(seconds):
+    if st.session_state.get("demo_pacing", DEMO_PACING):
+        time.sleep(seconds)
+
+def plotly_express():
+    # Imported on first use so startup doesn't pay for plotly
+    import plotly.express as px
+    return px
 
 # -------------------------
 # Load complaints data
 # -------------------------
-@st.cache_data
-def load_complaints_data(path=COMPLAINTS_DATA_PATH):
+def load_complaints_data(path=COMPLAINTS_DATA_PATH, warn=st.warning):
     if not os.path.exists(path):
-        st.error(f"Complaints data file not found at {path}")
+        warn(f"Complaints data file not found at {path}")
         return pd.DataFrame()
     try:
-        df = pd.read_excel(path)
+        failures = Counter()
+        df = coerce_types(read_excel_cached(path), failures=failures)
+        if failures:
+            warn("Unparseable readings set to NaN: " + ", ".join(f"{c} ({n})" for c, n in failures.items()))
         return df
     except Exception as e:
-        st.error(f"Error loading complaints data: {e}")
+        warn(f"Error loading complaints data: {e}")
         return pd.DataFrame()
 
+def load_complaint_table(path=COMPLAINTS_DATA_PATH, warn=st.warning):
+    """The complaint sheet, loaded once and shared read-only by every session."""
+    return ComplaintTable(load_complaints_data(path, warn=warn), source=path)
+
+def complaint_table():
+    # Waits for the background load only if it hasn't finished yet
+    return startup_loads()["complaints"].get()
+
+# -------------------------
+# Live complaint feed (row ids into the shared table)
+# -------------------------
+def fetch_live_complaints(n):
+    """Row ids (into the shared complaint table) of the next ``n`` complaints."""
+    table = complaint_table()
+    if INTAKE_SERVICE_URL:
+        try:
+            # Only complaints scored since this session's last fetch
+            fresh = fetch_results(INTAKE_SERVICE_URL, limit=n, since=st.session_state.get("intake_watermark"))
+            if not fresh.empty:
+                st.session_state.intake_watermark = int(fresh["Seq"].max())
+            return table.intern(fresh, version="Seq")
+        except Exception as e:
+            st.warning(f"Intake service unavailable ({e}); sampling the local complaint table")
+    return table.sample(n)
+
 # -------------------------
 # Load models (same as before)
 # -------------------------
+def load_model_registry(warn=st.warning):
+    registry = get_registry(FAULT_PATH_FALLBACKS, ETR_NOM_MODEL_PATH, ETR_ENCODERS_PATH, search_dir=SEARCH_DIR)
+    for msg in registry.warnings:
+        warn(msg)
+    return registry
+
+def reload_model_registry(changed, warn=st.warning):
+    # Only the artifacts in ``changed`` are reloaded
+    registry = reload_registry(FAULT_PATH_FALLBACKS, ETR_NOM_MODEL_PATH, ETR_ENCODERS_PATH, search_dir=SEARCH_DIR,
+                               changed=changed)
+    for msg in registry.warnings:
+        warn(msg)
+    return registry
+
+def models():
+    # Waits for the background load only if it hasn't finished yet
+    return startup_loads()["models"].get()
+
 @st.cache_resource
-def find_and_load_fault_bundle():
-    for p in FAULT_PATH_FALLBACKS:
-        if os.path.exists(p):
-            try:
-                with open(p, "rb") as f:
-                    bundle = pickle.load(f)
-                return bundle, p
-            except Exception:
-                try:
-                    m = joblib.load(p)
-                    return m, p
-                except Exception:
-                    continue
-    if os.path.exists(SEARCH_DIR):
-        files = os.listdir(SEARCH_DIR)
-        patterns = ["*fault*.pkl", "*best*.pkl", "*classifier*.pkl", "*pipe*.pkl", "*model*.pkl",
-                    "*fault*.joblib", "*best*.joblib", "*classifier*.joblib", "*model*.joblib", "*.pkl", "*.joblib"]
-        seen = set()
-        for pat in patterns:
-            for fname in fnmatch.filter(files, pat):
-                if fname in seen:
-                    continue
-                seen.add(fname)
-                full = os.path.join(SEARCH_DIR, fname)
-                try:
-                    with open(full, "rb") as f:
-                        bundle = pickle.load(f)
-                    return bundle, full
-                except Exception:
-                    try:
-                        m = joblib.load(full)
-                        return m, full
-                    except Exception:
-                        continue
-    return None, None
-
-_fault_bundle, _fault_loaded_from = find_and_load_fault_bundle()
-fault_pipeline = None
-fault_label_encoder = None
-if _fault_bundle is not None:
-    if isinstance(_fault_bundle, dict):
-        fault_pipeline = _fault_bundle.get("pipeline", _fault_bundle)
-        fault_label_encoder = _fault_bundle.get("label_encoder", None)
-    else:
-        fault_pipeline = _fault_bundle
-        fault_label_encoder = None
+def result_store():
+    # One store for every session: a complaint is scored once per process
+    return ResultStore()
 
 @st.cache_resource
-def load_nom(path=ETR_NOM_MODEL_PATH, enc_path=ETR_ENCODERS_PATH):
-    m = None; enc = {}
-    if os.path.exists(path):
-        try:
-            m = joblib.load(path)
-        except Exception as e:
-            st.warning(f"Could not load nom model from {path}: {e}")
-    if os.path.exists(enc_path):
-        try:
-            enc = joblib.load(enc_path)
-        except Exception as e:
-            st.warning(f"Could not load encoders from {enc_path}: {e}")
-    return m, enc
+def metrics_endpoint(port=METRICS_PORT):
+    # One /metrics server per process, started on the first run; a failed bind is not retried
+    try:
+        return serve_metrics(port) if port else None, None
+    except Exception as e:
+        return None, e
 
-nom_model, nom_encoders = load_nom()
+def classify_complaints(df, table):
+    """Rule labels plus Predicted_Label/Confidence; only unseen Request_Ids are scored."""
+    done = already_scored(df)  # rows the intake service scored keep its results
+    if done.all():
+        return df
+    # Stored results are tagged with the model and table versions (both can be hot-reloaded)
+    registry, generation = startup_loads()["models"].versioned()
+    stage = f"fault:{registry.fault_source or 'rules'}"
+    results = result_store().apply(
+        stage, df[~done],
+        lambda new: classify(new, registry.fault_pipeline, registry.fault_label_encoder,
+                             warn=st.warning)[FAULT_RESULT_COLUMNS],
+        version=(generation, table.meta["loaded_at"]),
+    )
+    if done.any():
+        results = pd.concat([df.loc[done, FAULT_RESULT_COLUMNS], results]).reindex(df.index)
+    return df.drop(columns=FAULT_RESULT_COLUMNS, errors="ignore").join(results)
+
+def estimate_etr(df, table):
+    """ETR minutes for the whole batch from one nom-model predict call."""
+    done = already_scored(df)
+    if done.all():
+        return df[ETR_RESULT_COLUMNS]
+    registry, generation = startup_loads()["models"].versioned()
+    hierarchy, hierarchy_generation = startup_loads()["hierarchy"].versioned()
+    stage = f"etr:{registry.etr_source or 'simulated'}"
+    etr = result_store().apply(
+        stage, df[~done],
+        lambda new: pipeline_estimate_etr(new, registry.etr_model, registry.etr_encoders,
+                                          hierarchy=hierarchy, warn=st.warning),
+        version=(generation, hierarchy_generation, table.meta["loaded_at"]),
+    )
+    if done.any():
+        etr = pd.concat([df.loc[done, ETR_RESULT_COLUMNS], etr]).reindex(df.index)
+    return etr
+
+
+def render_complaint_table(df, key, etr=None):
+    """Paginated complaint table: filter/sort/page on the server, one dataframe payload per page."""
+    render_started = time.perf_counter()
+    view = table_frame(df, hierarchy_index(), etr)
+    filter_cols = [c for c in FILTER_COLUMNS if c in view.columns and view[c].notna().any()]
+    cols = st.columns(len(filter_cols) + 2)
+    filters = {}
+    for col, name in zip(cols, filter_cols):
+        label = "Fault type" if name == "Predicted_Label" else name.title()
+        filters[name] = col.multiselect(label, filter_options(view, name), key=f"{key}_filter_{name}")
+    sort_choices = [label for label, c in SORT_COLUMNS.items() if c in view.columns]
+    sort_label = cols[-2].selectbox("Sort by", sort_choices, key=f"{key}_sort")
+    descending = cols[-1].checkbox("Descending", key=f"{key}_desc")
+    matched = filter_sort(view, filters, SORT_COLUMNS.get(sort_label), ascending=not descending)
+    n_pages = page_count(len(matched), TABLE_PAGE_SIZE)
+    page = 1
+    if n_pages > 1:
+        # Keyed on the page count so a narrower filter never leaves the page out of range
+        page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1,
+                               key=f"{key}_page_{n_pages}")
+    st.dataframe(page_slice(matched, page, TABLE_PAGE_SIZE), use_container_width=True, hide_index=True)
+    st.caption(f"{len(matched)} of {len(view)} complaints • page {page} of {n_pages}")
+    observe("render_table", time.perf_counter() - render_started)
 
 # -------------------------
 # Load hierarchy
 # -------------------------
-@st.cache_data
-def load_hierarchy(path=HIERARCHY_PATH):
+def load_hierarchy(path=HIERARCHY_PATH, warn=st.warning):
     if not os.path.exists(path):
         return pd.DataFrame(), {}
-    df = pd.read_excel(path).fillna("")
-    col_map = {}
-    for candidate in ["region","region_name","circle","circle_name","division","division_name","zone","zone_name"]:
-        for c in df.columns:
-            if candidate in c.lower():
-                key = candidate.split("_")[0]
-                if key not in col_map:
-                    col_map[key] = c
-    if "region" not in col_map:
-        for c in df.columns:
-            if "reg" in c.lower():
-                col_map["region"] = c; break
-    if "circle" not in col_map:
-        for c in df.columns:
-            if "circ" in c.lower():
-                col_map["circle"] = c; break
-    if "division" not in col_map:
-        for c in df.columns:
-            if "div" in c.lower():
-                col_map["division"] = c; break
-    if "zone" not in col_map:
-        for c in df.columns:
-            if "zone" in c.lower():
-                col_map["zone"] = c; break
+    df = read_excel_cached(path).fillna("")
+    col_map = detect_columns(df.columns)
     return df, col_map
 
-df_hier, hier_map = load_hierarchy()
+def load_hierarchy_index(path=HIERARCHY_PATH, warn=st.warning):
+    df, col_map = load_hierarchy(path, warn=warn)
+    return HierarchyIndex(df, col_map)
+
+def hierarchy_index():
+    # Waits for the background load only if it hasn't finished yet
+    return startup_loads()["hierarchy"].get()
+
+# -------------------------
+# Background loading (models and workbooks load off the script thread; the page paints at once)
+# -------------------------
+@st.cache_resource
+def startup_loads():
+    # Started by the first page view in this process and shared by every session
+    return {
+        "models": Deferred("models", load_model_registry).start(),
+        "complaints": Deferred("complaints", load_complaint_table).start(),
+        "hierarchy": Deferred("hierarchy", load_hierarchy_index).start(),
+    }
+
+def readiness(load, ok=None):
+    """Status icon: ⏳ still loading, ✅ loaded (and ``ok(value)``), ❌ otherwise."""
+    if not load.done:
+        return "⏳"
+    return "✅" if load.ready and (ok is None or ok(load.value)) else "❌"
+
+@st.cache_resource
+def file_watcher():
+    # Hot reload: a workbook or model replaced on disk is reloaded on the watcher thread and swapped
+    # in (sessions keep the previous version until then); the result store drops the old version's
+    # results once a run scores with the new one
+    loads = startup_loads()
+    watcher = FileWatcher()
+    watcher.watch("complaints", [COMPLAINTS_DATA_PATH], lambda changed: loads["complaints"].refresh())
+    watcher.watch("hierarchy", [HIERARCHY_PATH], lambda changed: loads["hierarchy"].refresh())
+    def model_paths():
+        # plus a fault model found by searching SEARCH_DIR, once the registry has loaded
+        found = loads["models"].value.fault_source if loads["models"].ready else None
+        return dict.fromkeys([*FAULT_PATH_FALLBACKS, ETR_NOM_MODEL_PATH, ETR_ENCODERS_PATH, *([found] if found else [])])
+    watcher.watch("models", model_paths, lambda changed: loads["models"].refresh(reload_model_registry, changed))
+    return watcher.start()
+
+loads = startup_loads()
+file_watcher()
+for _load in loads.values():
+    if _load.error is not None:
+        st.error(f"Loading {_load.name} failed: {_load.error}")
+    for _msg in (_load.messages if _load.done else []):
+        st.warning(_msg)
 
 # -------------------------
 # Header Section
@@ -321,20 +440,20 @@ st.subheader("📥 Step 1: Fetch Live Complaints")
 if st.button("🚀 Click to Fetch Live Complaints & Predict Faults", use_container_width=True, 
              type="primary", help="Fetch real-time complaints and start automated analysis"):
     
-    # Load complaints data
-    complaints_df = load_complaints_data()
+    # New complaints from the intake service, else a sample of the shared table
+    selection = complaint_table().view(fetch_live_complaints(FETCH_SIZE or random.randint(5, 8)))
     
-    if complaints_df.empty:
+    if selection.empty:
         st.error("No complaints data available. Please check the data file.")
     else:
-        # Select random complaints (5-8)
-        num_complaints = min(random.randint(5, 8), len(complaints_df))
-        selected_complaints = complaints_df.sample(n=num_complaints)
+        num_complaints = len(selection)
         
         # Display complaints with animation
         st.success(f"✅ Successfully fetched {num_complaints} live complaints!")
         
-        for idx, complaint in selected_complaints.iterrows():
+        inc("complaints_fetched", num_complaints)
+        render_started = time.perf_counter()
+        for idx, complaint in selection.table.take(selection.rows[:CARD_LIMIT]).iterrows():
             with st.container():
                 current_time = datetime.now()
                 # Create complaint time 2-3 minutes before current time
@@ -356,10 +475,15 @@ if st.button("🚀 Click to Fetch Live Complaints & Predict Faults", use_contain
                 </div>
                 """, unsafe_allow_html=True)
         
-        # Store selected complaints in session state
-        st.session_state.selected_complaints = selected_complaints
+        if num_complaints > CARD_LIMIT:
+            st.info(f"…and {num_complaints - CARD_LIMIT} more, listed in the results table after analysis")
+        
+        observe("render_fetch", time.perf_counter() - render_started)
+        
+        # Only row ids into the shared table are kept in session state
+        st.session_state.selection = selection
         st.session_state.current_step = 2
-        st.rerun()
+        rerun()
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -414,7 +538,7 @@ if 'current_step' in st.session_state and st.session_state.current_step >= 2:
     
     if st.button("🔍 Start Fault Detection Analysis", use_container_width=True, type="secondary"):
         st.session_state.current_step = 3
-        st.rerun()
+        rerun()
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -434,17 +558,26 @@ if 'current_step' in st.session_state and st.session_state.current_step >= 3:
     </div>
     """, unsafe_allow_html=True)
     
-    selected_complaints = st.session_state.get('selected_complaints', pd.DataFrame())
+    selection = st.session_state.get('selection')
     
-    if not selected_complaints.empty:
-        # Process each complaint with animation
+    if selection is not None and not selection.empty:
+        # Score the whole fetch in one batch, then render per complaint
+        scoring_started = time.perf_counter()
+        selected_complaints = classify_complaints(selection.frame(), selection.table)
+        selection.set_results(selected_complaints[FAULT_RESULT_COLUMNS])
+        scored, reused = result_store().last_run(f"fault:{models().fault_source or 'rules'}")
+        st.caption(f"Scored {scored} new complaints ({reused} reused from the result store) in {(time.perf_counter() - scoring_started) * 1000:.1f} ms")
+        render_started = time.perf_counter()
+        
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        for i, (idx, complaint) in enumerate(selected_complaints.iterrows()):
-            progress = (i + 1) / len(selected_complaints)
+        # Detailed cards for the first few; the full fetch goes in the paginated table
+        card_rows = selected_complaints.head(CARD_LIMIT)
+        for i, (idx, complaint) in enumerate(card_rows.iterrows()):
+            progress = (i + 1) / len(card_rows)
             progress_bar.progress(progress)
-            status_text.text(f"Analyzing complaint {i+1} of {len(selected_complaints)}...")
+            status_text.text(f"Rendering complaint {i+1} of {len(card_rows)}...")
             
             # Create analysis container
             with st.container():
@@ -459,6 +592,8 @@ if 'current_step' in st.session_state and st.session_state.current_step >= 3:
                         <p><strong>DTR MSN:</strong> {complaint.get('DTR_MSN', 'N/A')}</p>
                         <p><strong>Consumer MSN:</strong> {complaint.get('Consumer_MSN', 'N/A')}</p>
                         <p><strong>Phase:</strong> {complaint.get('Consumer_Phase_Id', 'N/A')}-Phase</p>
+                        <p><strong>Predicted Fault:</strong> {complaint.get('Predicted_Label', 'N/A')}</p>
+                        <p><strong>Rule Check:</strong> {complaint.get('Rule_Label', 'N/A')} — {complaint.get('Rule_Reason') or 'no rule reason'}</p>
                     </div>
                     """, unsafe_allow_html=True)
                 
@@ -505,19 +640,23 @@ if 'current_step' in st.session_state and st.session_state.current_step >= 3:
                     </div>
                     """, unsafe_allow_html=True)
             
-            # Simulate processing time
-            time.sleep(1)
+            demo_pause(1)
         
         progress_bar.empty()
         status_text.empty()
         
         st.success("✅ All complaints analyzed successfully!")
         
+        if len(selected_complaints) > CARD_LIMIT:
+            st.markdown(f"#### 📋 All {len(selected_complaints)} analyzed complaints")
+            render_complaint_table(selected_complaints, key="analysis_table")
+        
         # Show fault prediction results
         st.markdown("### 🎯 Fault Prediction Results")
         
         # Create results visualization
-        fault_counts = selected_complaints['Final_Label'].value_counts()
+        fault_counts = selected_complaints['Predicted_Label'].value_counts()
+        px = plotly_express()
         
         col1, col2 = st.columns(2)
         
@@ -545,9 +684,10 @@ if 'current_step' in st.session_state and st.session_state.current_step >= 3:
                 )
                 st.plotly_chart(fig, use_container_width=True)
         
-        # Store analysis results
+        observe("render_analysis", time.perf_counter() - render_started)
+        
+        # Results already live in the session's selection
         st.session_state.analysis_complete = True
-        st.session_state.analyzed_complaints = selected_complaints
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -569,7 +709,7 @@ if 'analysis_complete' in st.session_state and st.session_state.analysis_complet
     
     if st.button("🕒 Predict Restoration Time (ETR)", use_container_width=True, type="primary"):
         st.session_state.etr_prediction_started = True
-        st.rerun()
+        rerun()
 
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -578,51 +718,31 @@ if 'etr_prediction_started' in st.session_state and st.session_state.etr_predict
     st.markdown("---")
     st.markdown("<div class='fade-in'>", unsafe_allow_html=True)
     
-    analyzed_complaints = st.session_state.get('analyzed_complaints', pd.DataFrame())
+    selection = st.session_state.get('selection')
+    analyzed_complaints = selection.frame() if selection is not None else pd.DataFrame()
     
     if not analyzed_complaints.empty:
         # Show location hierarchy visualization
         st.subheader("🗺️ Location Analysis")
         
-        # Handle different column name cases for location data
-        location_cols = []
-        for col in ['REGION', 'region', 'Region']:
-            if col in analyzed_complaints.columns:
-                location_cols.append(col)
-                break
-        for col in ['CIRCLE', 'circle', 'Circle']:
-            if col in analyzed_complaints.columns:
-                location_cols.append(col)
-                break
-        for col in ['DIVISION', 'division', 'Division']:
-            if col in analyzed_complaints.columns:
-                location_cols.append(col)
-                break
-        for col in ['ZONE', 'zone', 'Zone']:
-            if col in analyzed_complaints.columns:
-                location_cols.append(col)
-                break
-
-        if len(location_cols) == 4:
-            locations = analyzed_complaints[location_cols].drop_duplicates()
-        else:
-            # Fallback to available columns
-            available_cols = [col for col in ['region', 'circle', 'division', 'zone'] if col in analyzed_complaints.columns]
-            locations = analyzed_complaints[available_cols].drop_duplicates() if available_cols else pd.DataFrame()
+        # Full path for every complaint from the precomputed hierarchy index
+        resolved = hierarchy_index().resolve(analyzed_complaints)
+        path_cols = [lvl for lvl in HIERARCHY_LEVELS if lvl in resolved.columns]
+        locations = resolved[path_cols].drop_duplicates() if path_cols else pd.DataFrame()
         
         for _, loc in locations.iterrows():
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                region_val = loc.get('REGION', loc.get('region', loc.get('Region', 'N/A')))
+                region_val = loc.get('region', 'N/A')
                 st.markdown(f"<div class='feature-box'><strong>Region</strong><br>{region_val}</div>", unsafe_allow_html=True)
             with col2:
-                circle_val = loc.get('CIRCLE', loc.get('circle', loc.get('Circle', 'N/A')))
+                circle_val = loc.get('circle', 'N/A')
                 st.markdown(f"<div class='feature-box'><strong>Circle</strong><br>{circle_val}</div>", unsafe_allow_html=True)
             with col3:
-                division_val = loc.get('DIVISION', loc.get('division', loc.get('Division', 'N/A')))
+                division_val = loc.get('division', 'N/A')
                 st.markdown(f"<div class='feature-box'><strong>Division</strong><br>{division_val}</div>", unsafe_allow_html=True)
             with col4:
-                zone_val = loc.get('ZONE', loc.get('zone', loc.get('Zone', 'N/A')))
+                zone_val = loc.get('zone', 'N/A')
                 st.markdown(f"<div class='feature-box'><strong>Zone</strong><br>{zone_val}</div>", unsafe_allow_html=True)
         
         # Time and season analysis
@@ -641,29 +761,36 @@ if 'etr_prediction_started' in st.session_state and st.session_state.etr_predict
         # ETR Prediction Results
         st.subheader("🎯 ETR Prediction Results")
         
-        # Simulate ETR prediction for each complaint
+        # Predict ETR for the whole batch, then render per complaint
+        scoring_started = time.perf_counter()
+        etr_predictions = estimate_etr(analyzed_complaints, selection.table)
+        scored, reused = result_store().last_run(f"etr:{models().etr_source or 'simulated'}")
+        st.caption(f"Predicted ETR for {scored} new complaints ({reused} reused from the result store) in {(time.perf_counter() - scoring_started) * 1000:.1f} ms")
+        render_started = time.perf_counter()
+        
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        etr_results = []
+        # Deadlines are fixed when a complaint is first estimated, so reruns don't restart the clocks
+        etr_deadlines = st.session_state.setdefault("etr_deadlines", {})
+        request_ids = analyzed_complaints.get('Request_Id', pd.Series(analyzed_complaints.index.astype(str), index=analyzed_complaints.index))
+        fault_types = analyzed_complaints.get('Predicted_Label', analyzed_complaints.get('Final_Label', pd.Series('N/A', index=analyzed_complaints.index)))
+        etr_results = [
+            {
+                'Request_Id': rid,
+                'Fault_Type': fault,
+                'ETR_Minutes': etr_minutes,
+                'ETR_Human': humanize_minutes(etr_minutes),
+                'End_Timestamp': etr_deadlines.setdefault(str(rid), end_timestamp_ms(etr_minutes)),
+            }
+            for rid, fault, etr_minutes in zip(request_ids, fault_types, etr_predictions['ETR_Minutes'].astype(int).tolist())
+        ]
         
-        for i, (idx, complaint) in enumerate(analyzed_complaints.iterrows()):
-            progress = (i + 1) / len(analyzed_complaints)
+        card_results = etr_results[:CARD_LIMIT]
+        for i, result in enumerate(card_results):
+            progress = (i + 1) / len(card_results)
             progress_bar.progress(progress)
-            status_text.text(f"Predicting ETR for complaint {i+1} of {len(analyzed_complaints)}...")
-            
-            # Simulate ETR prediction (in minutes)
-            # In real implementation, this would use the actual model
-            base_etr = random.randint(30, 180)
-            etr_minutes = base_etr
-            etr_human = f"{etr_minutes//60} hr {etr_minutes%60} min" if etr_minutes >= 60 else f"{etr_minutes} min"
-            
-            etr_results.append({
-                'Request_Id': complaint.get('Request_Id', 'N/A'),
-                'Fault_Type': complaint.get('Final_Label', 'N/A'),
-                'ETR_Minutes': etr_minutes,
-                'ETR_Human': etr_human
-            })
+            status_text.text(f"Rendering ETR for complaint {i+1} of {len(card_results)}...")
             
             # Display individual result
             with st.container():
@@ -671,23 +798,28 @@ if 'etr_prediction_started' in st.session_state and st.session_state.etr_predict
                 <div class="complaint-card">
                     <div style="display: flex; justify-content: space-between; align-items: center;">
                         <div>
-                            <strong>Request ID:</strong> {complaint.get('Request_Id', 'N/A')}
-                            | <strong>Fault:</strong> {complaint.get('Final_Label', 'N/A')}
+                            <strong>Request ID:</strong> {result['Request_Id']}
+                            | <strong>Fault:</strong> {result['Fault_Type']}
                         </div>
                         <div class="status-success" style="font-size: 18px;">
-                            <strong>ETR: {etr_human}</strong>
+                            <strong>ETR: {result['ETR_Human']}</strong>
                         </div>
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
             
-            time.sleep(0.5)  # Simulate processing time
+            demo_pause(0.5)
         
         progress_bar.empty()
         status_text.empty()
         
-        # Store ETR results
-        st.session_state.etr_results = etr_results
+        if len(etr_results) > CARD_LIMIT:
+            st.markdown(f"#### 📋 ETR for all {len(etr_results)} complaints")
+            render_complaint_table(analyzed_complaints, key="etr_table", etr=etr_predictions)
+        
+        # Store ETR results as compact arrays on the selection
+        selection.set_results(pd.DataFrame(etr_results)[['Fault_Type', 'ETR_Minutes', 'End_Timestamp']])
+        observe("render_etr", time.perf_counter() - render_started)
         st.session_state.etr_complete = True
 
 st.markdown("</div>", unsafe_allow_html=True)
@@ -698,87 +830,30 @@ if 'etr_complete' in st.session_state and st.session_state.etr_complete:
     st.markdown("<div class='fade-in'>", unsafe_allow_html=True)
     st.subheader("⏳ Live Restoration Countdown")
     
-    etr_results = st.session_state.get('etr_results', [])
+    selection = st.session_state.get('selection')
+    etr_results = []
+    if selection is not None and selection.has('ETR_Minutes', 'End_Timestamp'):
+        etr_results = selection.records(['Request_Id', 'Fault_Type', 'ETR_Minutes', 'End_Timestamp'])
     
     if etr_results:
-        # Find the maximum ETR for the overall countdown
-        max_etr = max(result['ETR_Minutes'] for result in etr_results)
-        end_time = datetime.now() + timedelta(minutes=max_etr)
-        end_timestamp = int(end_time.timestamp() * 1000)
-        
-        # Overall countdown timer
-        countdown_html = f'''
-        <div style="font-family:Arial,Helvetica,sans-serif; text-align: center;">
-          <h3 style="color: #032a4d;">Overall Maximum Restoration Time</h3>
-          <div id="countdown" style="font-size: 36px; color: #06263b; font-weight: 700; margin: 20px 0;"></div>
-          <p style="color: #4b7b9a;">Estimated completion: {end_time.strftime("%H:%M:%S")}</p>
-        </div>
-        <script>
-        function startCountdown(endTime) {{
-          function update() {{
-            var now = new Date().getTime();
-            var distance = endTime - now;
-            if (distance < 0) {{
-              document.getElementById('countdown').innerHTML = "✅ RESTORED";
-              document.getElementById('countdown').style.color = "#10b981";
-              return;
-            }}
-            var hours = Math.floor((distance % (1000 * 60 * 60 * 24)) / (1000 * 60 * 60));
-            var minutes = Math.floor((distance % (1000 * 60 * 60)) / (1000 * 60));
-            var seconds = Math.floor((distance % (1000 * 60)) / 1000);
-            document.getElementById('countdown').innerHTML =
-              hours.toString().padStart(2,'0') + ":" + minutes.toString().padStart(2,'0') + ":" + seconds.toString().padStart(2,'0');
-          }}
-          update();
-          setInterval(update, 1000);
-        }}
-        startCountdown({end_timestamp});
-        </script>
-        '''
-        components.html(countdown_html, height=200)
-        
-        # Individual complaint countdowns
-        st.subheader("📋 Individual Complaint Timelines")
-        
-        for result in etr_results:
-            complaint_end_time = datetime.now() + timedelta(minutes=result['ETR_Minutes'])
-            complaint_timestamp = int(complaint_end_time.timestamp() * 1000)
-            
-            individual_countdown = f'''
-            <div style="font-family:Arial,Helvetica,sans-serif; margin: 15px 0; padding: 15px; border-radius: 10px; background: #f8fafc;">
-              <div style="display: flex; justify-content: space-between; align-items: center;">
-                <div>
-                  <strong>Req {result['Request_Id']}</strong> | {result['Fault_Type']}
-                </div>
-                <div id="countdown-{result['Request_Id']}" style="font-size: 20px; color: #3b82f6; font-weight: 600;"></div>
-              </div>
-            </div>
-            <script>
-            function startIndividualCountdown(endTime, elementId) {{
-              function update() {{
-                var now = new Date().getTime();
-                var distance = endTime - now;
-                if (distance < 0) {{
-                  document.getElementById(elementId).innerHTML = "✅ DONE";
-                  document.getElementById(elementId).style.color = "#10b981";
-                  return;
-                }}
-                var hours = Math.floor((distance % (1000 * 60 * 60 * 24)) / (1000 * 60 * 60));
-                var minutes = Math.floor((distance % (1000 * 60 * 60)) / (1000 * 60));
-                var seconds = Math.floor((distance % (1000 * 60)) / 1000);
-                document.getElementById(elementId).innerHTML =
-                  hours.toString().padStart(2,'0') + ":" + minutes.toString().padStart(2,'0') + ":" + seconds.toString().padStart(2,'0');
-              }}
-              update();
-              setInterval(update, 1000);
-            }}
-            startIndividualCountdown({complaint_timestamp}, "countdown-{result['Request_Id']}");
-            </script>
-            '''
-            components.html(individual_countdown, height=80)
+        # One component and one timer for every countdown (virtualized list)
+        with timed("render_countdown"):
+            countdown, height = countdown_html(etr_results, theme=LIGHT_THEME)
+            components.html(countdown, height=height)
 
 st.markdown("</div>", unsafe_allow_html=True)
 
+# -------------------------
+# Profiling (ends once the ETR step has run under the profiler)
+# -------------------------
+if workflow_profiler is not None and st.session_state.get('etr_complete'):
+    try:
+        st.session_state.profile_summary = workflow_profiler.finish()
+    except Exception as e:
+        st.warning(f"Could not write the workflow profile: {e}")
+    del st.session_state["workflow_profiler"]
+    workflow_profiler = None
+
 # -------------------------
 # Footer
 # -------------------------
@@ -796,22 +871,90 @@ with st.sidebar:
     st.markdown("**Model Status:**")
     col1, col2 = st.columns(2)
     with col1:
-        st.markdown(f"Fault Model: {'✅' if fault_pipeline is not None else '❌'}")
+        st.markdown(f"Fault Model: {readiness(loads['models'], lambda r: r.fault_pipeline is not None)}")
     with col2:
-        st.markdown(f"ETR Model: {'✅' if nom_model is not None else '❌'}")
+        st.markdown(f"ETR Model: {readiness(loads['models'], lambda r: r.etr_model is not None)}")
     
     # Data status
     st.markdown("**Data Status:**")
-    complaints_df = load_complaints_data()
-    st.markdown(f"Live Complaints: {len(complaints_df) if not complaints_df.empty else '0'}")
+    if loads["complaints"].ready:
+        table = complaint_table()
+        st.markdown(f"Live Complaints: {table.meta['base_rows']}")
+        st.caption(f"Shared complaint table • {table.sessions} active session(s)")
+    else:
+        st.markdown(f"Live Complaints: {readiness(loads['complaints'])}")
+    st.caption("Startup: " + " • ".join(
+        f"{readiness(load)} {name} {load.elapsed:.1f}s" + (f" ↻{load.reloads}" if load.reloads else "")
+        for name, load in loads.items()))
+    
+    # Pipeline metrics (process-wide, every session)
+    with st.expander("📈 Pipeline Metrics"):
+        stage_stats = METRICS.snapshot()
+        if stage_stats.empty:
+            st.caption("No stages timed yet")
+        else:
+            st.dataframe(stage_stats.round({"p50_ms": 1, "p95_ms": 1, "p99_ms": 1, "max_ms": 1, "total_s": 2}),
+                         use_container_width=True, hide_index=True)
+        for name, value in METRICS.counters().items():
+            st.caption(f"{name}: {value}")
+        metrics_error = metrics_endpoint()[1]
+        if metrics_error is not None:
+            st.warning(f"Metrics endpoint not started on port {METRICS_PORT}: {metrics_error}")
+        st.download_button("Export Prometheus metrics", METRICS.prometheus_text(), file_name="eoi_metrics.prom",
+                           mime="text/plain", use_container_width=True)
     
     st.markdown("---")
     st.markdown("### 🎯 Quick Actions")
     
+    st.checkbox("🎬 Demo pacing", value=DEMO_PACING, key="demo_pacing",
+                help="Slow the analysis and ETR steps down for presentations")
+    
     if st.button("🔄 Reset Workflow", use_container_width=True):
         for key in list(st.session_state.keys()):
             del st.session_state[key]
-        st.rerun()
+        rerun()
+    
+    # Profiling mode: restart the workflow with a profiler attached
+    st.radio("Profiler", PROFILE_MODES, key="profile_mode", horizontal=True,
+             format_func=lambda m: {"cprofile": "cProfile", "sampling": "Sampling"}[m],
+             help="cProfile times every call; sampling only records stacks and costs far less")
+    if workflow_profiler is None:
+        if st.button("🔬 Profile Workflow Run", use_container_width=True,
+                     help="Reset, then record fetch → analysis → detailed analysis → ETR"):
+            for key in list(st.session_state.keys()):
+                if key != "profile_mode":
+                    del st.session_state[key]
+            try:
+                st.session_state.workflow_profiler = WorkflowProfiler(mode=st.session_state.profile_mode)
+            except Exception as e:
+                st.error(f"Profiler not started: {e}")
+            rerun()
+    else:
+        st.caption(f"🔬 Profiling ({workflow_profiler.mode}) • run {workflow_profiler.runs} • "
+                   f"saved when ETR prediction completes")
+        if st.button("⏹ Stop Profiling", use_container_width=True):
+            try:
+                st.session_state.profile_summary = workflow_profiler.finish()
+            except Exception as e:
+                st.warning(f"Could not write the workflow profile: {e}")
+            del st.session_state["workflow_profiler"]
+            rerun()
+    
+    profile_summary = st.session_state.get("profile_summary")
+    if profile_summary:
+        with st.expander("🔬 Last Workflow Profile", expanded=True):
+            peak = profile_summary["peak_mb"]
+            st.caption(f"{profile_summary['mode']} • {profile_summary['runs']} reruns • "
+                       f"{profile_summary['wall_s']:.2f} s • {profile_summary['samples']} samples"
+                       + (f" • peak {peak:.1f} MB traced" if peak is not None else ""))
+            st.dataframe(profile_summary["top"].round({"self_s": 4, "cumulative_s": 4}),
+                         use_container_width=True, hide_index=True)
+            if not profile_summary["allocations"].empty:
+                st.markdown("**Allocation growth**")
+                st.dataframe(profile_summary["allocations"].head(10).round({"size_kb": 1}),
+                             use_container_width=True, hide_index=True)
+            for kind, path in profile_summary["files"].items():
+                st.caption(f"{kind}: `{path}`")
     
     if st.button("📊 Download Report", use_container_width=True):
         st.info("Report generation feature coming soon!")
@@ -826,4 +969,25 @@ with st.sidebar:
     4. ETR Prediction<br>
     5. Live Countdown
     </div>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+
+# -------------------------
+# Metrics export
+# -------------------------
+metrics_endpoint()
+if workflow_profiler is not None:
+    workflow_profiler.pause()
+observe("rerun", time.perf_counter() - RUN_STARTED)
+if METRICS_FILE:
+    try:
+        METRICS.write_prometheus(METRICS_FILE)
+    except Exception as e:
+        st.warning(f"Could not write metrics to {METRICS_FILE}: {e}")
+
+# -------------------------
+# Readiness: repaint once the background loads finish
+# -------------------------
+if not all(load.done for load in loads.values()):
+    for load in loads.values():
+        load.wait()
+    rerun()
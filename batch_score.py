@@ -0,0 +1,334 @@
+# batch_score.py
+"""Headless fault → ETR scoring over a whole complaint file.
+
+Runs the same loaders and models as the dashboards (columnar Excel cache,
+shared model registry, hierarchy index) without a browser, pushing the file
+through fault labelling and ETR in vectorized batches and writing the
+results to Parquet or CSV.
+
+    python batch_score.py data.xlsx -o results.parquet
+    python batch_score.py archive.csv -o results.csv --batch-size 100000
+    python batch_score.py archive.parquet -o results.parquet --workers 8 --shard-by zone
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from complaint_schema import coerce_types, concat_batches
+from data_cache import PARQUET_AVAILABLE, read_excel_cached, normalize_for_columnar
+from hierarchy_index import HierarchyIndex
+from ingest import iter_complaint_batches
+from metrics import METRICS
+from model_registry import get_registry
+from pipeline import (
+    DEFAULT_SEARCH_DIR, DEFAULT_FAULT_CANDIDATES, DEFAULT_ETR_MODEL_PATH, DEFAULT_ETR_ENCODERS_PATH,
+    DEFAULT_HIERARCHY_PATH, RESULT_COLUMNS, KEY_COLUMNS, score_batch,
+)
+
+log = logging.getLogger("batch_score")
+
+DEFAULT_BATCH_SIZE = 50000
+
+
+# -------------------------
+# Input / output
+# -------------------------
+def iter_input(path, batch_size=DEFAULT_BATCH_SIZE, limit=None, failures=None):
+    """Typed complaint batches from ``path``.
+
+    Excel goes through the columnar cache (one parse per file version) and is
+    sliced; CSV / JSON-lines / Parquet are streamed by ``ingest``.
+    Unparseable readings are counted per column into ``failures``.
+    """
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xls"):
+        df = coerce_types(read_excel_cached(path), failures=failures)
+        if limit is not None:
+            df = df.iloc[:limit]
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start:start + batch_size]
+        return
+    seen = 0
+    for batch in iter_complaint_batches(path, batch_size, failures):
+        if limit is not None and seen + len(batch) > limit:
+            batch = batch.iloc[:limit - seen]
+        seen += len(batch)
+        if len(batch):
+            yield batch
+        if limit is not None and seen >= limit:
+            return
+
+
+def output_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "csv" if os.path.splitext(path)[1].lower() == ".csv" else "parquet"
+
+
+def select_output(df, all_columns=False):
+    if all_columns:
+        return df
+    return df[[c for c in KEY_COLUMNS if c in df.columns] + [c for c in RESULT_COLUMNS if c in df.columns]]
+
+
+class ResultWriter:
+    """Appends scored batches to a Parquet or CSV file as they finish."""
+
+    def __init__(self, path, fmt):
+        if fmt == "parquet" and not PARQUET_AVAILABLE:
+            raise RuntimeError("pyarrow is required for Parquet output; use -o results.csv")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.fmt = fmt
+        self.rows = 0
+        self._parquet = None
+        self._header = True
+
+    def write(self, df):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            df = normalize_for_columnar(df.astype({c: object for c in df.columns if df[c].dtype == "category"}))
+            if self._parquet is None:
+                schema = pa.Schema.from_pandas(df, preserve_index=False)
+                # an all-missing text column has no type yet; later batches carry strings
+                schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in schema],
+                                   metadata=schema.metadata)
+                self._parquet = pq.ParquetWriter(self.path, schema)
+            self._parquet.write_table(pa.Table.from_pandas(df, schema=self._parquet.schema, preserve_index=False))
+        else:
+            # all-NaN float columns (Confidence without a fault model) trip a
+            # spurious cast warning in pandas' CSV formatter
+            with np.errstate(invalid="ignore"):
+                df.to_csv(self.path, index=False, mode="w" if self._header else "a", header=self._header)
+            self._header = False
+        self.rows += len(df)
+
+    def close(self, columns=()):
+        """Finish the file; an empty run still gets a file with ``columns``."""
+        if self.rows == 0 and self._parquet is None and self._header:
+            self.write(pd.DataFrame(columns=list(columns)))
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+
+# -------------------------
+# Parallel scoring
+# -------------------------
+_worker = {}
+
+
+def registry_args(args):
+    return (tuple(args.fault_model or DEFAULT_FAULT_CANDIDATES), args.etr_model, args.encoders,
+            args.search_dir, not args.no_mmap)
+
+
+def _init_worker(reg_args, hierarchy_path, when):
+    # Each worker maps the same uncompressed model copies under .cache/models,
+    # so model arrays are shared through the page cache rather than copied.
+    fault, etr, enc, search_dir, mmap = reg_args
+    _worker["registry"] = get_registry(list(fault), etr, enc, search_dir=search_dir, mmap=mmap)
+    _worker["hierarchy"] = HierarchyIndex.from_file(hierarchy_path)
+    _worker["when"] = when
+
+
+def _score_shard(shard, all_columns):
+    out = score_batch(shard, _worker["registry"], _worker["hierarchy"], _worker["when"])
+    return select_output(out, all_columns)
+
+
+def iter_shards(batches, n_shards, shard_by="rows", hierarchy=None):
+    """Split each batch into ``n_shards`` pieces by row range or by zone.
+
+    Yields ``(batch_number, shard)``. Zone sharding keeps every zone's
+    complaints in one shard (zones are bucketed by hashed code); without a
+    zone column it falls back to rows.
+    """
+    for n, batch in enumerate(batches):
+        if shard_by == "zone" and hierarchy is not None:
+            resolved = hierarchy.resolve(batch)
+            if "zone" in resolved.columns:
+                codes = pd.util.hash_array(resolved["zone"].astype(str).to_numpy(dtype=object)) % n_shards
+                for _, shard in batch.groupby(codes, sort=False):
+                    yield n, shard
+                continue
+        for idx in np.array_split(np.arange(len(batch)), min(n_shards, max(len(batch), 1))):
+            if len(idx):
+                yield n, batch.iloc[idx]
+
+
+def score_parallel(shards, workers, reg_args, hierarchy_path, when, all_columns=False):
+    """Score ``(key, shard)`` pairs in a process pool; ``(key, result)`` come back in submission order.
+
+    At most ``2 * workers`` shards are in flight, so memory stays bounded for
+    archives far larger than RAM.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(reg_args, hierarchy_path, when)) as pool:
+        pending = deque()
+        for key, shard in shards:
+            pending.append((key, pool.submit(_score_shard, shard, all_columns)))
+            if len(pending) >= 2 * workers:
+                key, fut = pending.popleft()
+                yield key, fut.result()
+        while pending:
+            key, fut = pending.popleft()
+            yield key, fut.result()
+
+
+def regroup(results):
+    """Concatenate consecutive ``(batch_number, shard)`` results back into batches in input order."""
+    key, parts = None, []
+    for k, part in results:
+        if parts and k != key:
+            yield concat_batches(parts).sort_index(kind="stable")
+            parts = []
+        key = k
+        parts.append(part)
+    if parts:
+        yield concat_batches(parts).sort_index(kind="stable")
+
+
+# -------------------------
+# Run
+# -------------------------
+def load_registry(args):
+    fault, etr, enc, search_dir, mmap = registry_args(args)
+    return get_registry(list(fault), etr, enc, search_dir=search_dir, mmap=mmap)
+
+
+def _timed(batches, clock):
+    it = iter(batches)
+    while True:
+        t = time.perf_counter()
+        batch = next(it, None)
+        clock["read"] += time.perf_counter() - t
+        if batch is None:
+            return
+        clock["batches"] += 1
+        yield batch
+
+
+def run(args):
+    """Score ``args.input`` and write ``args.output``; returns a summary dict."""
+    timings = {}
+    t0 = time.perf_counter()
+    registry = load_registry(args)
+    for msg in registry.warnings:
+        log.warning(msg)
+    hierarchy = HierarchyIndex.from_file(args.hierarchy)
+    timings["load_models"] = time.perf_counter() - t0
+
+    when = pd.Timestamp(args.when) if args.when else datetime.now()
+    clock = {"read": 0.0, "batches": 0}
+    failures = Counter()
+    batches = _timed(iter_input(args.input, args.batch_size, args.limit, failures), clock)
+    if args.workers > 1:
+        shards = iter_shards(batches, args.workers, args.shard_by, hierarchy)
+        results = score_parallel(shards, args.workers, registry_args(args), args.hierarchy, when, args.all_columns)
+        if args.shard_by == "zone":
+            # zone shards reorder a batch's rows; put each batch back in input order
+            results = regroup(results)
+        else:
+            results = (part for _, part in results)
+    else:
+        results = (select_output(score_batch(b, registry, hierarchy, when), args.all_columns) for b in batches)
+
+    # Each result is appended as it arrives, so only the batches in flight are held in memory
+    fmt = output_format(args.output, args.format)
+    writer = ResultWriter(args.output, fmt)
+    labels = Counter()
+    t = time.perf_counter()
+    write_s = 0.0
+    try:
+        for part in results:
+            tw = time.perf_counter()
+            writer.write(part)
+            write_s += time.perf_counter() - tw
+            if "Predicted_Label" in part.columns:
+                labels.update(part["Predicted_Label"].dropna().tolist())
+        tw = time.perf_counter()
+        writer.close(KEY_COLUMNS + RESULT_COLUMNS)
+        write_s += time.perf_counter() - tw
+    except BaseException:
+        writer.close()
+        raise
+    # Reading overlaps with the workers in parallel mode; score is the remainder
+    timings["read"] = clock["read"]
+    timings["write"] = write_s
+    timings["score"] = time.perf_counter() - t - clock["read"] - write_s
+    timings["total"] = time.perf_counter() - t0
+    rows = writer.rows
+
+    return {
+        "input": args.input,
+        "output": args.output,
+        "format": fmt,
+        "rows": int(rows),
+        "batches": clock["batches"],
+        "workers": args.workers,
+        "fault_model": registry.fault_source or "rules",
+        "etr_model": registry.etr_source or "simulated",
+        "timings": timings,
+        "rows_per_s": rows / timings["score"] if timings["score"] > 0 else float("nan"),
+        "labels": dict(labels.most_common()),
+        "parse_failures": dict(failures),
+    }
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description="Score a complaint file (fault label + ETR) without the dashboard.")
+    p.add_argument("input", help="complaint file (.xlsx, .csv, .jsonl or .parquet)")
+    p.add_argument("-o", "--output", required=True, help="results file (.parquet or .csv)")
+    p.add_argument("--format", choices=["parquet", "csv"], help="output format (default: from extension)")
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="complaints scored per model call")
+    p.add_argument("--limit", type=int, help="score only the first N complaints")
+    p.add_argument("--when", help="timestamp used for time-of-day/season ETR features (default: now)")
+    p.add_argument("--workers", type=int, default=1, help="scoring processes (default: 1, in-process)")
+    p.add_argument("--shard-by", choices=["rows", "zone"], default="rows",
+                   help="how each batch is split across workers")
+    p.add_argument("--all-columns", action="store_true", help="keep every input column in the output")
+    p.add_argument("--fault-model", action="append", help="fault model path (repeatable; default: dashboard list)")
+    p.add_argument("--search-dir", default=DEFAULT_SEARCH_DIR, help="directory indexed for a fault model")
+    p.add_argument("--etr-model", default=DEFAULT_ETR_MODEL_PATH)
+    p.add_argument("--encoders", default=DEFAULT_ETR_ENCODERS_PATH)
+    p.add_argument("--hierarchy", default=DEFAULT_HIERARCHY_PATH)
+    p.add_argument("--no-mmap", action="store_true", help="load models into private memory")
+    p.add_argument("--metrics-file", help="write per-stage latency metrics here (Prometheus text format)")
+    p.add_argument("-q", "--quiet", action="store_true")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(levelname)s %(message)s")
+    if not os.path.exists(args.input):
+        log.error("Input not found: %s", args.input)
+        return 2
+    summary = run(args)
+    t = summary["timings"]
+    log.info("Scored %d complaints in %d batches on %d worker(s) -> %s (%s)", summary["rows"],
+             summary["batches"], summary["workers"], summary["output"], summary["format"])
+    log.info("Fault model: %s | ETR model: %s", summary["fault_model"], summary["etr_model"])
+    log.info("load %.2fs | read %.2fs | score %.2fs | write %.2fs | total %.2fs",
+             t["load_models"], t["read"], t["score"], t["write"], t["total"])
+    log.info("Throughput: %.0f complaints/s", summary["rows_per_s"])
+    if args.metrics_file:
+        METRICS.write_prometheus(args.metrics_file)
+        log.info("Stage metrics written to %s", args.metrics_file)
+    if summary["parse_failures"]:
+        log.warning("Unparseable readings set to NaN: %s",
+                    ", ".join(f"{c} ({n})" for c, n in summary["parse_failures"].items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
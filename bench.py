@@ -0,0 +1,339 @@
+# bench.py
+"""Reproducible benchmarks for the complaint → fault → ETR pipeline.
+
+Generates synthetic complaints with the data.xlsx layout (seeded, so every
+run sees the same rows), times each stage the dashboards and batch_score.py
+run, and writes the numbers as JSON so two commits can be compared:
+
+    python bench.py -o bench.json                       # 1k / 100k / 1M rows
+    python bench.py --sizes 1k,10k --repeat 5 -o quick.json
+    python bench.py --sizes 100k -o new.json --compare old.json
+
+Stages: load (xlsx parse vs. columnar cache), coerce, rules, fault model,
+ETR encoding and prediction, hierarchy resolve/rollups and the payload the
+dashboards send (countdown component and one table page). Stages whose
+artifact is missing are recorded as skipped.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from complaint_schema import (
+    COMPLAINT_COLUMNS, FEEDER_READINGS, DTR_READINGS, CONSUMER_READINGS, PING_COLUMNS, STATUS_COLUMNS,
+    coerce_types,
+)
+from complaint_table import DEFAULT_PAGE_SIZE, page_slice, table_frame
+from countdown import countdown_html
+from data_cache import read_excel_cached
+from etr_engine import build_etr_frame, encode_features, model_features, predict_etr, simulated_etr
+from fault_engine import label_by_rules, predict_faults
+from hierarchy_index import HierarchyIndex
+from model_registry import get_registry
+from pipeline import (
+    DEFAULT_SEARCH_DIR, DEFAULT_FAULT_CANDIDATES, DEFAULT_ETR_MODEL_PATH, DEFAULT_ETR_ENCODERS_PATH,
+    DEFAULT_HIERARCHY_PATH,
+)
+
+log = logging.getLogger("bench")
+
+DEFAULT_SIZES = "1k,100k,1M"
+DEFAULT_REPEAT = 3
+# Writing and parsing xlsx is minutes per 100k rows; larger sizes skip it
+DEFAULT_XLSX_MAX_ROWS = 100000
+
+LABELS = ["FEEDER", "FOC", "FOC/DT", "DTLT_FAULT", "DTHT_FAULT", "FOC_DTHT_FAULT"]
+LABEL_WEIGHTS = [0.40, 0.25, 0.15, 0.10, 0.06, 0.04]
+REASONS = ["Did not match any rule", "Ping exists but DTR & Consumer readings all NULL",
+           "One DTR phase current == 0 but not all zero; voltage present", None]
+
+
+# -------------------------
+# Synthetic complaints
+# -------------------------
+def parse_size(text):
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def _ids(rng, prefix, pool_size, n):
+    pool = np.array([f"{prefix}{i:07d}" for i in range(pool_size)], dtype=object)
+    return pool[rng.integers(0, pool_size, size=n)]
+
+
+def synth_complaints(n, seed=0, zones=None):
+    """``n`` raw complaint rows shaped like ``read_excel("data.xlsx")``.
+
+    Meter pools scale with ``n`` (about 50 complaints per feeder, 6 per DTR),
+    readings follow the sheet's ranges with dead phases and missing blocks,
+    and pings / statuses agree. With ``zones`` a ``zone`` column is added so
+    hierarchy rollups have something to group.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({"Request_Id": np.char.add("NT_", np.arange(n).astype(str)).astype(object)})
+    pings = {c: rng.random(n) < 0.55 for c in PING_COLUMNS}
+    for msn, status, ping, prefix, pool in [
+        ("Feeder_MSN", STATUS_COLUMNS[0], "F_ping", "BS", max(1, n // 50)),
+        ("DTR_MSN", STATUS_COLUMNS[1], "D_ping", "DT", max(1, n // 6)),
+        ("Consumer_MSN", STATUS_COLUMNS[2], "C_ping", "EZ", max(1, n // 3)),
+    ]:
+        df[msn] = _ids(rng, prefix, pool, n)
+        df[status] = np.where(pings[ping], "success", "fail").astype(object)
+    df["Consumer_Phase_Id"] = rng.choice([1, 3], size=n, p=[0.7, 0.3])
+
+    readings = {}
+    for cols, volts, amps in [(FEEDER_READINGS, 64.0, 1.0), (DTR_READINGS, 245.0, 0.4)]:
+        for c in cols[:3]:
+            readings[c] = rng.normal(volts, volts * 0.02, n)
+        for c in cols[3:]:
+            readings[c] = np.abs(rng.normal(amps, amps * 0.5, n))
+    # Dead DTR phases (unbalance / partial zero current) and silent meters
+    dead = rng.integers(0, 3, size=n)
+    readings[DTR_READINGS[0]][(dead == 0) & (rng.random(n) < 0.05)] = 0.0
+    readings[DTR_READINGS[3]][(dead == 1) & (rng.random(n) < 0.08)] = 0.0
+    three_phase = df["Consumer_Phase_Id"].to_numpy() == 3
+    for c in CONSUMER_READINGS:
+        volts = c.endswith(("_vr", "_vy", "_vb", "_v"))
+        values = rng.normal(240.0, 5.0, n) if volts else np.abs(rng.normal(2.0, 1.5, n))
+        single = c.startswith("C_sp")
+        values[three_phase == single] = np.nan
+        readings[c] = values
+    silent = rng.random(n) < 0.1
+    for c in DTR_READINGS + CONSUMER_READINGS:
+        readings[c][silent] = np.nan
+    for c in FEEDER_READINGS + DTR_READINGS + CONSUMER_READINGS:
+        df[c] = readings[c]
+    for c in PING_COLUMNS:
+        df[c] = pings[c]
+    df["Final_Label"] = rng.choice(LABELS, size=n, p=LABEL_WEIGHTS).astype(object)
+    df["Label_Reason"] = np.array(REASONS, dtype=object)[rng.integers(0, len(REASONS), size=n)]
+    df = df[COMPLAINT_COLUMNS]
+    if zones is not None and len(zones):
+        df["zone"] = np.asarray(zones, dtype=object)[rng.integers(0, len(zones), size=n)]
+    return df
+
+
+# -------------------------
+# Timing
+# -------------------------
+def _time(fn, repeat):
+    runs, out = [], None
+    for _ in range(max(1, repeat)):
+        t = time.perf_counter()
+        out = fn()
+        runs.append(time.perf_counter() - t)
+    return out, runs
+
+
+def _record(runs, rows, **extra):
+    best = min(runs)
+    return {
+        "seconds": best,
+        "median": statistics.median(runs),
+        "runs": runs,
+        "rows_per_s": rows / best if best > 0 else None,
+        **extra,
+    }
+
+
+def _skipped(reason):
+    return {"skipped": reason}
+
+
+def bench_load(raw, workdir, repeat, xlsx_max_rows):
+    """xlsx parse vs. columnar cache (first build and warm hits)."""
+    n = len(raw)
+    if n > xlsx_max_rows:
+        skip = _skipped(f"{n} rows > --xlsx-max-rows {xlsx_max_rows}")
+        return {"load_xlsx": skip, "load_cache_build": skip, "load_cache_hit": skip}
+    path = os.path.join(workdir, f"complaints-{n}.xlsx")
+    t = time.perf_counter()
+    raw.to_excel(path, index=False)
+    log.info("  wrote %s in %.1fs", os.path.basename(path), time.perf_counter() - t)
+    cache_dir = os.path.join(workdir, "cache")
+    _, xlsx_runs = _time(lambda: pd.read_excel(path), 1)
+    _, build_runs = _time(lambda: read_excel_cached(path, cache_dir=cache_dir), 1)
+    _, hit_runs = _time(lambda: read_excel_cached(path, cache_dir=cache_dir), repeat)
+    return {
+        "load_xlsx": _record(xlsx_runs, n, file_bytes=os.path.getsize(path)),
+        "load_cache_build": _record(build_runs, n),
+        "load_cache_hit": _record(hit_runs, n),
+    }
+
+
+def bench_size(n, registry, hierarchy, args, workdir):
+    stages = {}
+    t = time.perf_counter()
+    zones = hierarchy.names["zone"] if not hierarchy.empty and "zone" in hierarchy.levels else None
+    raw = synth_complaints(n, seed=args.seed, zones=zones)
+    log.info("%d rows: generated in %.1fs", n, time.perf_counter() - t)
+
+    stages.update(bench_load(raw, workdir, args.repeat, args.xlsx_max_rows))
+
+    df, runs = _time(lambda: coerce_types(raw), args.repeat)
+    stages["coerce"] = _record(runs, n, raw_bytes=int(raw.memory_usage(deep=True).sum()),
+                               compact_bytes=int(df.memory_usage(deep=True).sum()))
+
+    rules, runs = _time(lambda: label_by_rules(df), args.repeat)
+    stages["rules"] = _record(runs, n)
+    labelled = df.assign(Predicted_Label=rules["Rule_Label"])
+
+    if registry.fault_pipeline is not None:
+        try:
+            _, runs = _time(lambda: predict_faults(registry.fault_pipeline, registry.fault_label_encoder, df),
+                            args.repeat)
+            stages["fault_model"] = _record(runs, n, source=registry.fault_source)
+        except Exception as e:
+            stages["fault_model"] = _skipped(f"prediction failed: {e}")
+    else:
+        stages["fault_model"] = _skipped("no fault model found")
+
+    when = pd.Timestamp(args.when)
+    frame, runs = _time(lambda: build_etr_frame(labelled, when, hierarchy), args.repeat)
+    stages["etr_features"] = _record(runs, n)
+    if registry.etr_encoders:
+        columns = model_features(registry.etr_model, registry.etr_encoders) if registry.etr_model is not None else None
+        _, runs = _time(lambda: encode_features(frame, registry.etr_encoders, columns), args.repeat)
+        stages["etr_encode"] = _record(runs, n)
+    else:
+        stages["etr_encode"] = _skipped("no ETR encoders found")
+    if registry.etr_model is not None:
+        try:
+            etr, runs = _time(lambda: predict_etr(registry.etr_model, registry.etr_encoders, labelled, when, hierarchy),
+                              args.repeat)
+            stages["etr_predict"] = _record(runs, n, source=registry.etr_source)
+        except Exception as e:
+            etr = simulated_etr(labelled, np.random.default_rng(args.seed))
+            stages["etr_predict"] = _skipped(f"prediction failed: {e}")
+    else:
+        etr = simulated_etr(labelled, np.random.default_rng(args.seed))
+        stages["etr_predict"] = _skipped("no ETR model found")
+
+    if not hierarchy.empty:
+        _, runs = _time(lambda: hierarchy.resolve(df), args.repeat)
+        stages["hierarchy_resolve"] = _record(runs, n)
+        for level in hierarchy.levels:
+            _, runs = _time(lambda: hierarchy.rollup(df, level), args.repeat)
+            stages[f"rollup_{level}"] = _record(runs, n)
+    else:
+        stages["hierarchy_resolve"] = _skipped("no hierarchy file")
+
+    records = [
+        {"Request_Id": rid, "Fault_Type": fault, "ETR_Minutes": minutes}
+        for rid, fault, minutes in zip(df["Request_Id"].tolist(), labelled["Predicted_Label"].tolist(),
+                                       etr["ETR_Minutes"].tolist())
+    ]
+    (html, _), runs = _time(lambda: countdown_html(records), args.repeat)
+    stages["payload_countdown"] = _record(runs, n, bytes=len(html.encode("utf-8")))
+    view = table_frame(labelled, hierarchy if not hierarchy.empty else None, etr)
+    page, runs = _time(lambda: page_slice(view, 1, DEFAULT_PAGE_SIZE).to_json(orient="records"), args.repeat)
+    stages["payload_table_page"] = _record(runs, n, bytes=len(page.encode("utf-8")), page_rows=min(n, DEFAULT_PAGE_SIZE))
+    return stages
+
+
+# -------------------------
+# Report
+# -------------------------
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def environment():
+    return {
+        "commit": _git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def compare(current, baseline):
+    """(size, stage, baseline s, current s, speedup) for stages timed in both runs."""
+    rows = []
+    for size, stages in current["sizes"].items():
+        base = baseline.get("sizes", {}).get(size, {})
+        for stage, rec in stages.items():
+            old = base.get(stage, {})
+            if "seconds" in rec and "seconds" in old:
+                rows.append((size, stage, old["seconds"], rec["seconds"],
+                             old["seconds"] / rec["seconds"] if rec["seconds"] > 0 else float("inf")))
+    return rows
+
+
+def run(args):
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    registry = get_registry(list(args.fault_model or DEFAULT_FAULT_CANDIDATES), args.etr_model, args.encoders,
+                            search_dir=args.search_dir)
+    for msg in registry.warnings:
+        log.warning(msg)
+    hierarchy = HierarchyIndex.from_file(args.hierarchy)
+    report = {"environment": environment(), "seed": args.seed, "repeat": args.repeat, "sizes": {}}
+    with tempfile.TemporaryDirectory(prefix="eoi-bench-") as workdir:
+        for n in sizes:
+            report["sizes"][str(n)] = bench_size(n, registry, hierarchy, args, workdir)
+    return report
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description="Benchmark the complaint → fault → ETR pipeline on synthetic data.")
+    p.add_argument("-o", "--output", help="JSON results file (default: stdout)")
+    p.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated row counts, e.g. 1k,100k,1M")
+    p.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per stage (best is reported)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--when", default="2024-06-15 14:00", help="timestamp for time-of-day/season ETR features")
+    p.add_argument("--xlsx-max-rows", type=int, default=DEFAULT_XLSX_MAX_ROWS,
+                   help="largest size for which the xlsx load is benchmarked")
+    p.add_argument("--compare", help="earlier JSON results to print speedups against")
+    p.add_argument("--fault-model", action="append", help="fault model path (repeatable; default: dashboard list)")
+    p.add_argument("--search-dir", default=DEFAULT_SEARCH_DIR, help="directory indexed for a fault model")
+    p.add_argument("--etr-model", default=DEFAULT_ETR_MODEL_PATH)
+    p.add_argument("--encoders", default=DEFAULT_ETR_ENCODERS_PATH)
+    p.add_argument("--hierarchy", default=DEFAULT_HIERARCHY_PATH)
+    p.add_argument("-q", "--quiet", action="store_true")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(levelname)s %(message)s")
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        log.info("Results written to %s", args.output)
+    else:
+        print(text)
+    for size, stages in report["sizes"].items():
+        for stage, rec in stages.items():
+            if "seconds" in rec:
+                log.info("%8s rows  %-20s %9.4fs", size, stage, rec["seconds"])
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for size, stage, old, new, speedup in compare(report, baseline):
+            log.info("%8s rows  %-20s %9.4fs -> %9.4fs  x%.2f", size, stage, old, new, speedup)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
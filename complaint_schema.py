@@ -0,0 +1,159 @@
+# complaint_schema.py
+"""Column layout of the complaint sheet (data.xlsx) and type coercion.
+
+``coerce_types`` also applies the compact in-memory layout: float32
+readings, categorical MSNs / status / labels and bool pings. data.xlsx
+readings are float32-precision to begin with, so nothing is lost, and the
+frame each session holds shrinks to a fraction of the ``read_excel`` one.
+"""
+import numpy as np
+import pandas as pd
+
+# -------------------------
+# Column groups
+# -------------------------
+ID_COLUMNS = ["Request_Id", "Feeder_MSN", "DTR_MSN", "Consumer_MSN"]
+STATUS_COLUMNS = ["Feeder_ProcessStatus", "DTR_ProcessStatus", "Consumer_ProcessStatus"]
+FEEDER_READINGS = ["f_vr", "f_vy", "f_vb", "f_ir", "f_iy", "f_ib"]
+DTR_READINGS = ["d_vr", "d_vy", "d_vb", "d_ir", "d_iy", "d_ib"]
+CONSUMER_READINGS = ["C_tp_vr", "C_tp_vy", "C_tp_vb", "C_tp_ir", "C_tp_iy", "C_tp_ib", "C_sp_i", "C_sp_v"]
+READING_COLUMNS = FEEDER_READINGS + DTR_READINGS + CONSUMER_READINGS
+PING_COLUMNS = ["C_ping", "D_ping", "F_ping"]
+LABEL_COLUMNS = ["Final_Label", "Label_Reason"]
+
+COMPLAINT_COLUMNS = [
+    "Request_Id",
+    "Feeder_MSN", "Feeder_ProcessStatus",
+    "DTR_MSN", "DTR_ProcessStatus",
+    "Consumer_MSN", "Consumer_ProcessStatus",
+    "Consumer_Phase_Id",
+] + READING_COLUMNS + PING_COLUMNS + LABEL_COLUMNS
+
+_TRUE_TOKENS = {"true", "1", "yes", "y", "success"}
+# Reading cells that mean "no value" (compared stripped and lower-cased)
+NA_TOKENS = ["", "na", "n/a", "nan", "-"]
+
+# -------------------------
+# Compact in-memory layout
+# -------------------------
+READING_DTYPE = np.float32
+PHASE_DTYPE = "Int8"
+# Fixed categories so batches concatenate without falling back to object
+STATUS_DTYPE = pd.CategoricalDtype(["fail", "success"])
+# Low-cardinality string columns stored as categoricals. Request_Id is
+# unique per row, so it stays a plain string column.
+CATEGORICAL_COLUMNS = ["Feeder_MSN", "DTR_MSN", "Consumer_MSN"] + LABEL_COLUMNS
+
+
+# -------------------------
+# Coercion
+# -------------------------
+def _to_bool(s):
+    if s.dtype == bool:
+        return s
+    if pd.api.types.is_numeric_dtype(s):
+        return s.fillna(0).astype(bool)
+    return s.astype(str).str.strip().str.lower().isin(_TRUE_TOKENS)
+
+
+def _parse_values(values):
+    """(float64 array, failed mask) for an object array of distinct cells."""
+    out = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+    failed = np.zeros(len(values), dtype=bool)
+    rest = np.flatnonzero(np.isnan(out))
+    if len(rest):
+        text = pd.Series(values[rest], dtype=object).astype(str).str.strip()
+        keep = ~text.str.lower().isin(NA_TOKENS).to_numpy()
+        cleaned = pd.to_numeric(text[keep].str.replace(",", "", regex=False), errors="coerce")
+        out[rest[keep]] = cleaned.to_numpy(dtype=np.float64)
+        failed[rest[keep]] = cleaned.isna().to_numpy()
+    return out, failed
+
+
+def parse_numeric_column(s):
+    """Vectorized reading cleanup -> (float64 Series, count of unparseable cells).
+
+    NA tokens and missing cells become NaN, thousands separators are
+    dropped, anything else that is not a number becomes NaN and is counted as
+    a failure. Each distinct cell is parsed once and the results are
+    broadcast back by code.
+    """
+    if pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s):
+        return s.astype(np.float64), 0
+    codes, uniques = pd.factorize(s)
+    values, failed = _parse_values(np.asarray(uniques, dtype=object))
+    # code -1 (missing cell) picks the NaN slot at the end
+    out = np.append(values, np.nan)[codes]
+    n_failed = int(np.append(failed, False)[codes].sum())
+    return pd.Series(out, index=s.index, name=s.name), n_failed
+
+
+def _to_str(s):
+    out = s.astype(object)
+    mask = s.notna()
+    out[mask] = s[mask].astype(str)
+    return out
+
+
+def coerce_types(df, compact=True, failures=None):
+    """Give a raw batch (xlsx rows, CSV chunk, JSON lines) the sheet's types.
+
+    Ids become strings (NaN kept), readings float, pings bool. Columns the
+    batch does not carry are left alone so partial feeds still work. With
+    ``compact`` the result is shrunk by ``compact_types``. ``failures``, if
+    given, is a Counter updated with unparseable readings per column.
+    """
+    df = df.copy()
+    for c in ID_COLUMNS + STATUS_COLUMNS + LABEL_COLUMNS:
+        if c in df.columns:
+            df[c] = _to_str(df[c])
+    for c in READING_COLUMNS + ["Consumer_Phase_Id"]:
+        if c in df.columns:
+            df[c], failed = parse_numeric_column(df[c])
+            if failed and failures is not None:
+                failures[c] += failed
+    for c in PING_COLUMNS:
+        if c in df.columns:
+            df[c] = _to_bool(df[c])
+    return compact_types(df) if compact else df
+
+
+def compact_types(df):
+    """Downcast a coerced batch to the compact layout (in place, returns ``df``)."""
+    for c in READING_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].astype(READING_DTYPE)
+    if "Consumer_Phase_Id" in df.columns:
+        phase = df["Consumer_Phase_Id"].dropna()
+        if phase.eq(phase.round()).all():
+            # a stray out-of-range id widens the column instead of failing the cast
+            for dtype in (PHASE_DTYPE, "Int16", "Int32"):
+                info = np.iinfo(dtype.lower())
+                if phase.empty or (phase.min() >= info.min and phase.max() <= info.max):
+                    df["Consumer_Phase_Id"] = df["Consumer_Phase_Id"].astype(dtype)
+                    break
+    for c in STATUS_COLUMNS:
+        if c in df.columns:
+            known = df[c].isna() | df[c].isin(STATUS_DTYPE.categories)
+            df[c] = df[c].astype(STATUS_DTYPE if known.all() else "category")
+    for c in CATEGORICAL_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
+
+
+def concat_batches(frames):
+    """``pd.concat`` that keeps categorical columns categorical.
+
+    Plain concat turns a column into object as soon as two batches have
+    different categories; here the categories are unioned first.
+    """
+    frames = [f for f in frames if len(f.columns)]
+    if len(frames) < 2:
+        return frames[0] if frames else pd.DataFrame()
+    for c in frames[0].columns:
+        dtypes = [f[c].dtype if c in f.columns else None for f in frames]
+        if all(isinstance(d, pd.CategoricalDtype) for d in dtypes) and len(set(dtypes)) > 1:
+            cats = pd.api.types.union_categoricals([f[c] for f in frames]).categories
+            frames = [f.assign(**{c: f[c].cat.set_categories(cats)}) for f in frames]
+    return pd.concat(frames)
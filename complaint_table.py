@@ -0,0 +1,75 @@
+# complaint_table.py
+"""Server-side filter / sort / paginate for the complaint results table.
+
+Per-complaint cards cost a dozen Streamlit elements each, sent over the
+websocket on every rerun. Beyond ``CARD_LIMIT`` complaints the dashboards
+show a table instead: filtering, sorting and slicing happen here on the
+server, and only the current page goes to the browser as a single
+``st.dataframe`` payload, so render time and traffic are bounded by
+``page_size`` rather than by the size of the fetch.
+"""
+import math
+
+import numpy as np
+
+from hierarchy_index import LEVELS
+
+CARD_LIMIT = 12
+DEFAULT_PAGE_SIZE = 50
+
+TABLE_COLUMNS = [
+    "Request_Id", "Predicted_Label", "Confidence", "Rule_Label", "ETR_Minutes",
+    *LEVELS,
+    "Feeder_MSN", "DTR_MSN", "Consumer_MSN", "F_ping", "D_ping", "C_ping",
+]
+# Sort choices shown in the UI -> column
+SORT_COLUMNS = {
+    "ETR": "ETR_Minutes",
+    "Fault type": "Predicted_Label",
+    "Confidence": "Confidence",
+    "Request ID": "Request_Id",
+    **{lvl.title(): lvl for lvl in LEVELS},
+}
+FILTER_COLUMNS = ["Predicted_Label", *LEVELS]
+
+
+def table_frame(df, hierarchy=None, etr=None):
+    """Display columns for ``df``, with the full location path and ETR joined in."""
+    view = df
+    if hierarchy is not None:
+        resolved = hierarchy.resolve(df)
+        view = view.drop(columns=[c for c in view.columns if str(c).lower() in LEVELS])
+        view = view.join(resolved.drop(columns=["node_id"]))
+    if etr is not None:
+        view = view.drop(columns=list(etr.columns), errors="ignore").join(etr)
+    return view[[c for c in TABLE_COLUMNS if c in view.columns]]
+
+
+def filter_options(view, column):
+    if column not in view.columns:
+        return []
+    return sorted(view[column].dropna().astype(str).unique().tolist())
+
+
+def filter_sort(view, filters=None, sort_by=None, ascending=True):
+    """Rows matching every non-empty ``filters[column]`` list, sorted by ``sort_by``."""
+    mask = np.ones(len(view), dtype=bool)
+    for column, values in (filters or {}).items():
+        if values and column in view.columns:
+            mask &= view[column].astype(str).isin(values).to_numpy()
+    out = view[mask]
+    if sort_by in out.columns:
+        out = out.sort_values(sort_by, ascending=ascending, na_position="last", kind="stable")
+    return out
+
+
+def page_count(n_rows, page_size=DEFAULT_PAGE_SIZE):
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def page_slice(view, page, page_size=DEFAULT_PAGE_SIZE):
+    """1-based ``page`` of ``view`` (clamped to the last page)."""
+    page = min(max(int(page), 1), page_count(len(view), page_size))
+    start = (page - 1) * page_size
+    return view.iloc[start:start + page_size]
+
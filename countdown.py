@@ -0,0 +1,128 @@
+# countdown.py
+"""One restoration-countdown component for every open complaint.
+
+The dashboards used to call ``components.html`` once per ETR result, so each
+complaint got its own iframe and its own ``setInterval``. ``countdown_html``
+instead builds a single document: the whole list of (Request_Id, end time,
+fault) goes in as one JSON payload, one timer drives the overall and the
+per-complaint countdowns, and the list is virtualized. Only the rows
+scrolled into view exist in the DOM, so page load and client CPU stay flat
+as the open-complaint count grows.
+"""
+import json
+from datetime import datetime
+
+ROW_HEIGHT = 56
+MAX_VISIBLE_ROWS = 8
+OVERALL_HEIGHT = 200
+HEADER_HEIGHT = 48
+
+LIGHT_THEME = {
+    "title": "#032a4d", "overall": "#06263b", "muted": "#4b7b9a", "done": "#10b981",
+    "row_bg": "#f8fafc", "row_text": "#032a4d", "row_timer": "#3b82f6", "heading": "#032a4d",
+}
+DARK_THEME = {
+    "title": "#ffffff", "overall": "#38b2ac", "muted": "#a0aec0", "done": "#48bb78",
+    "row_bg": "rgba(26, 32, 44, 0.8)", "row_text": "#e2e8f0", "row_timer": "#4299e1", "heading": "#ffffff",
+}
+
+
+def end_timestamp_ms(minutes, start=None):
+    start = start or datetime.now()
+    return int(start.timestamp() * 1000) + int(minutes) * 60000
+
+
+def countdown_payload(etr_results, start=None):
+    """Compact rows for the client: id, fault and absolute end time in epoch ms."""
+    return [
+        {
+            "id": str(r.get("Request_Id", "N/A")),
+            "fault": str(r.get("Fault_Type", "N/A")),
+            "end": int(r["End_Timestamp"]) if r.get("End_Timestamp") else end_timestamp_ms(r["ETR_Minutes"], start),
+        }
+        for r in etr_results
+    ]
+
+
+def countdown_height(n_rows, max_rows=MAX_VISIBLE_ROWS, row_height=ROW_HEIGHT):
+    return OVERALL_HEIGHT + HEADER_HEIGHT + min(max(n_rows, 1), max_rows) * row_height + 16
+
+
+def countdown_html(etr_results, theme=LIGHT_THEME, max_rows=MAX_VISIBLE_ROWS, row_height=ROW_HEIGHT):
+    """(html, height) for one ``components.html`` call covering every complaint."""
+    rows = countdown_payload(etr_results)
+    overall_end = max((r["end"] for r in rows), default=end_timestamp_ms(0))
+    # "</" inside the JSON would close the <script> element early
+    payload = json.dumps(rows, separators=(",", ":")).replace("</", "<\\/")
+    viewport = min(max(len(rows), 1), max_rows) * row_height
+    html = f'''
+    <div style="font-family:Arial,Helvetica,sans-serif;">
+      <div style="text-align: center; height: {OVERALL_HEIGHT}px;">
+        <h3 style="color: {theme['title']};">Overall Maximum Restoration Time</h3>
+        <div id="countdown" style="font-size: 36px; color: {theme['overall']}; font-weight: 700; margin: 20px 0;"></div>
+        <p style="color: {theme['muted']};">Estimated completion: <span id="completion"></span></p>
+      </div>
+      <h4 style="color: {theme['heading']}; margin: 8px 0 12px 0; height: {HEADER_HEIGHT - 20}px;">
+        📋 Individual Complaint Timelines ({len(rows)})</h4>
+      <div id="viewport" style="height: {viewport}px; overflow-y: auto; position: relative;">
+        <div id="spacer" style="height: {len(rows) * row_height}px; position: relative;"></div>
+      </div>
+    </div>
+    <script>
+    (function() {{
+      var ROWS = {payload};
+      var ROW_H = {row_height}, OVERSCAN = 4, OVERALL_END = {overall_end};
+      var viewport = document.getElementById('viewport'), spacer = document.getElementById('spacer');
+      var overall = document.getElementById('countdown');
+      var mounted = {{}};  // row index -> timer element, only for rows in view
+
+      function fmt(distance) {{
+        var h = Math.floor(distance / 3600000), m = Math.floor((distance % 3600000) / 60000),
+            s = Math.floor((distance % 60000) / 1000);
+        return String(h).padStart(2, '0') + ':' + String(m).padStart(2, '0') + ':' + String(s).padStart(2, '0');
+      }}
+      function paint(el, end, now, doneText) {{
+        var d = end - now;
+        if (d < 0) {{ el.textContent = doneText; el.style.color = '{theme['done']}'; }}
+        else {{ el.textContent = fmt(d); }}
+      }}
+      function makeRow(i) {{
+        var r = ROWS[i], row = document.createElement('div');
+        row.style.cssText = 'position:absolute;left:0;right:0;top:' + (i * ROW_H) + 'px;height:' + (ROW_H - 8) +
+          'px;box-sizing:border-box;padding:0 15px;border-radius:10px;background:{theme['row_bg']};' +
+          'display:flex;justify-content:space-between;align-items:center;color:{theme['row_text']};';
+        var label = document.createElement('div'), b = document.createElement('strong');
+        b.textContent = 'Req ' + r.id;
+        label.appendChild(b);
+        label.appendChild(document.createTextNode(' | ' + r.fault));
+        var timer = document.createElement('div');
+        timer.style.cssText = 'font-size:20px;color:{theme['row_timer']};font-weight:600;';
+        row.appendChild(label); row.appendChild(timer);
+        spacer.appendChild(row);
+        return {{row: row, timer: timer}};
+      }}
+      function render() {{
+        var first = Math.max(0, Math.floor(viewport.scrollTop / ROW_H) - OVERSCAN);
+        var last = Math.min(ROWS.length, Math.ceil((viewport.scrollTop + viewport.clientHeight) / ROW_H) + OVERSCAN);
+        for (var k in mounted) {{
+          if (k < first || k >= last) {{ spacer.removeChild(mounted[k].row); delete mounted[k]; }}
+        }}
+        var now = Date.now();
+        for (var i = first; i < last; i++) {{
+          if (!mounted[i]) {{ mounted[i] = makeRow(i); paint(mounted[i].timer, ROWS[i].end, now, '✅ DONE'); }}
+        }}
+      }}
+      function tick() {{
+        var now = Date.now();
+        paint(overall, OVERALL_END, now, '✅ RESTORED');
+        for (var k in mounted) paint(mounted[k].timer, ROWS[k].end, now, '✅ DONE');
+      }}
+      document.getElementById('completion').textContent = new Date(OVERALL_END).toLocaleTimeString();
+      viewport.addEventListener('scroll', function() {{ window.requestAnimationFrame(render); }});
+      render();
+      tick();
+      setInterval(tick, 1000);
+    }})();
+    </script>
+    '''
+    return html, countdown_height(len(rows), max_rows, row_height)
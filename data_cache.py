@@ -0,0 +1,156 @@
+# data_cache.py
+"""Columnar on-disk cache for the complaint workbook.
+
+Parsing data.xlsx through openpyxl dominates cold start, so the first load
+converts the sheet to Parquet (or a pickled frame when pyarrow is missing)
+and later loads read that file instead. Entries are keyed on the source
+file's mtime/size and SHA-256, so touching the workbook without changing it
+does not force a re-parse and replacing it always does.
+"""
+import os
+import json
+import hashlib
+
+import pandas as pd
+
+from metrics import inc, timed
+
+try:
+    import pyarrow  # noqa: F401  (pandas picks it up for parquet)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+CACHE_DIR = os.environ.get("EOI_CACHE_DIR", ".cache")
+CACHE_FORMAT_VERSION = 1
+
+
+# -------------------------
+# File identity
+# -------------------------
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_signature(path):
+    """Cheap (mtime_ns, size) pair used before falling back to hashing."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _cache_paths(path, cache_dir):
+    abspath = os.path.abspath(path)
+    stem = os.path.splitext(os.path.basename(abspath))[0].replace(" ", "_")
+    tag = hashlib.sha1(abspath.encode("utf-8")).hexdigest()[:10]
+    base = os.path.join(cache_dir, f"{stem}-{tag}")
+    ext = ".parquet" if PARQUET_AVAILABLE else ".pkl"
+    return base + ext, base + ".json"
+
+
+# -------------------------
+# Read / write helpers
+# -------------------------
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_atomic(path, write_fn):
+    tmp = f"{path}.tmp-{os.getpid()}"
+    try:
+        write_fn(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_meta(meta_path, meta):
+    def _dump(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+    _write_atomic(meta_path, _dump)
+
+
+def _read_frame(data_path):
+    if data_path.endswith(".parquet"):
+        return pd.read_parquet(data_path)
+    return pd.read_pickle(data_path)
+
+
+def _write_frame(df, data_path):
+    if data_path.endswith(".parquet"):
+        _write_atomic(data_path, lambda tmp: df.to_parquet(tmp, index=False))
+    else:
+        _write_atomic(data_path, lambda tmp: df.to_pickle(tmp))
+
+
+def normalize_for_columnar(df):
+    """Make object columns single-typed so they round-trip through Parquet.
+
+    MSN columns mix ints (e.g. 1573283) and strings (e.g. EZ0801417); they are
+    stored as strings with missing values kept as NaN.
+    """
+    df = df.copy()
+    for c in df.columns:
+        if df[c].dtype == object:
+            df[c] = df[c].where(df[c].isna(), df[c].astype(str))
+    return df
+
+
+# -------------------------
+# Public entry point
+# -------------------------
+def read_excel_cached(path, cache_dir=CACHE_DIR):
+    """Load an Excel sheet, serving repeat loads from the columnar cache."""
+    with timed("data_load"):
+        return _read_excel_cached(path, cache_dir)
+
+
+def _read_excel_cached(path, cache_dir):
+    data_path, meta_path = _cache_paths(path, cache_dir)
+    mtime_ns, size = file_signature(path)
+    meta = _read_meta(meta_path)
+
+    digest = None
+    if meta and meta.get("version") == CACHE_FORMAT_VERSION and os.path.exists(data_path):
+        if meta.get("mtime_ns") == mtime_ns and meta.get("size") == size:
+            inc("data_cache", result="hit")
+            return _read_frame(data_path)
+        if meta.get("size") == size:
+            digest = file_sha256(path)
+            if meta.get("sha256") == digest:
+                # Touched but unchanged: refresh the cheap key and reuse.
+                meta["mtime_ns"] = mtime_ns
+                try:
+                    _write_meta(meta_path, meta)
+                except OSError:
+                    pass
+                inc("data_cache", result="hit")
+                return _read_frame(data_path)
+
+    inc("data_cache", result="miss")
+    df = normalize_for_columnar(pd.read_excel(path))
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_frame(df, data_path)
+        _write_meta(meta_path, {
+            "version": CACHE_FORMAT_VERSION,
+            "source": os.path.abspath(path),
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "sha256": digest or file_sha256(path),
+            "rows": int(len(df)),
+            "columns": [str(c) for c in df.columns],
+        })
+    except Exception:
+        # Read-only deployments still work, they just re-parse every time.
+        pass
+    return df
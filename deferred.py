@@ -0,0 +1,124 @@
+# deferred.py
+"""Values that load on a background thread so the first page paint doesn't wait.
+
+The dashboards used to load the model registry, the complaint workbook and
+the hierarchy at import time, so every worker restart showed a blank page
+until all of them were in memory. A ``Deferred`` starts its loader on a
+daemon thread and ``get()`` only blocks when a value is needed before it
+is ready; ``state`` and ``elapsed`` drive the readiness indicator.
+``refresh`` reloads a value that changed on disk and swaps it in.
+
+Loaders run off the script thread, where ``st.warning`` does nothing, so
+they are called with a ``warn`` callback (as in pipeline.py) and the
+messages are kept on ``messages`` for the dashboard to show.
+"""
+import threading
+import time
+
+from metrics import observe
+
+
+class Deferred:
+    """``fn(*args, warn=..., **kwargs)`` computed once on a daemon thread."""
+
+    def __init__(self, name, fn, *args, **kwargs):
+        self.name = name
+        self._fn, self._args, self._kwargs = fn, args, kwargs
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        self.value = None
+        self.error = None
+        self.messages = []
+        self.started = None
+        self.finished = None
+        self.reloads = 0
+        self.reloaded_at = None
+
+    def start(self):
+        """Start loading (once); returns self."""
+        with self._lock:
+            if self._thread is None:
+                self.started = time.perf_counter()
+                self._thread = threading.Thread(target=self._run, name=f"load-{self.name}", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            self.value = self._fn(*self._args, warn=self.messages.append, **self._kwargs)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = time.perf_counter()
+            observe(f"startup_{self.name}", self.finished - self.started)
+            self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def ready(self):
+        return self.done and self.error is None
+
+    @property
+    def state(self):
+        if self._thread is None:
+            return "idle"
+        if not self.done:
+            return "loading"
+        return "failed" if self.error is not None else "ready"
+
+    @property
+    def elapsed(self):
+        """Seconds spent loading so far (or in total, once done)."""
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def wait(self, timeout=None):
+        """Start if needed and block until done (or ``timeout``); True when done."""
+        self.start()
+        return self._done.wait(timeout)
+
+    def get(self, timeout=None):
+        """The loaded value, waiting for it if necessary; re-raises a loader error."""
+        if not self.wait(timeout):
+            raise TimeoutError(f"{self.name} still loading after {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def versioned(self, timeout=None):
+        """``(value, reloads)`` read together, to tag results with the version they came from."""
+        self.get(timeout)
+        with self._lock:
+            return self.value, self.reloads
+
+    def refresh(self, fn=None, *args, **kwargs):
+        """Load a new value on the calling thread and swap it in; False if that fails.
+
+        Readers keep getting the previous value until the new one is complete,
+        and keep it if the reload fails. ``fn(*args, warn=..., **kwargs)``
+        defaults to the original loader.
+        """
+        self.wait()
+        messages = []
+        t = time.perf_counter()
+        try:
+            if fn is None:
+                value = self._fn(*self._args, warn=messages.append, **self._kwargs)
+            else:
+                value = fn(*args, warn=messages.append, **kwargs)
+        except Exception as e:
+            self.messages = self.messages + [f"Reloading {self.name} failed, still serving the previous version: {e}"]
+            return False
+        observe(f"reload_{self.name}", time.perf_counter() - t)
+        with self._lock:
+            self.value = value
+            self.error = None
+            self.messages = messages
+            self.reloads += 1
+            self.reloaded_at = time.time()
+        return True
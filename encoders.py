@@ -0,0 +1,78 @@
+# encoders.py
+"""Compiled lookup tables for the ETR feature encoders.
+
+``feature_encoders 1.pkl`` holds sklearn ``LabelEncoder``s (msn_id alone has
+over a thousand classes). ``LabelEncoder.transform`` binary-searches the
+sorted classes and raises on any unseen value, so a new meter in the field
+used to break ETR prediction. At load time each encoder is turned into a
+hash table (``pandas.Index``) with an explicit unknown bucket, and batch
+encoding becomes one vectorized ``get_indexer`` call per column.
+"""
+import numpy as np
+import pandas as pd
+
+UNKNOWN_CODE = -1
+
+
+class CompiledEncoder:
+    """Hashed, unseen-tolerant replacement for a fitted ``LabelEncoder``."""
+
+    def __init__(self, classes, unknown_code=UNKNOWN_CODE):
+        classes = np.asarray(classes)
+        self.classes_ = classes
+        self.unknown_code = unknown_code
+        self._numeric = classes.dtype.kind in "iuf"
+        keys = classes if self._numeric else classes.astype(str).astype(object)
+        self._index = pd.Index(keys, dtype=None if self._numeric else object)
+        self._index.get_indexer(keys[:1])  # build the hash table now, not on first request
+
+    @classmethod
+    def from_label_encoder(cls, encoder, unknown_code=UNKNOWN_CODE):
+        return cls(encoder.classes_, unknown_code)
+
+    def __len__(self):
+        return len(self.classes_)
+
+    def _keys(self, values):
+        values = pd.Series(values) if not isinstance(values, (pd.Series, pd.Index)) else values
+        if self._numeric:
+            return pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+        return values.astype(str).to_numpy(dtype=object)
+
+    def _lookup(self, values):
+        if isinstance(getattr(values, "dtype", None), pd.CategoricalDtype):
+            # One lookup per category; code -1 (missing) picks the NaN slot at the end
+            cat = pd.Categorical(values)
+            table = self._index.get_indexer(self._keys(cat.categories.append(pd.Index([np.nan]))))
+            return table[cat.codes]
+        return self._index.get_indexer(self._keys(values))
+
+    def transform(self, values):
+        """Codes for ``values``; anything not seen at fit time gets ``unknown_code``."""
+        codes = self._lookup(values)
+        if self.unknown_code != -1:
+            codes = np.where(codes < 0, self.unknown_code, codes)
+        return codes.astype(np.int64)
+
+    def inverse_transform(self, codes):
+        codes = np.asarray(codes)
+        known = (codes >= 0) & (codes < len(self.classes_))
+        out = np.full(codes.shape, None, dtype=object)
+        out[known] = self.classes_[codes[known]]
+        return out
+
+    def unseen_mask(self, values):
+        return self._lookup(values) < 0
+
+
+def compile_encoders(encoders, unknown_code=UNKNOWN_CODE):
+    """Compile every fitted encoder in ``encoders``; other entries pass through."""
+    compiled = {}
+    for name, enc in (encoders or {}).items():
+        if isinstance(enc, CompiledEncoder):
+            compiled[name] = enc
+        elif hasattr(enc, "classes_"):
+            compiled[name] = CompiledEncoder.from_label_encoder(enc, unknown_code)
+        else:
+            compiled[name] = enc
+    return compiled
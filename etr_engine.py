@@ -0,0 +1,149 @@
+# etr_engine.py
+"""Batched ETR (estimated time for restoration) prediction.
+
+Categorical features (meter id, fault label, hierarchy, time of day, season)
+are encoded column-wise with the compiled ``feature_encoders`` (see
+encoders.py) and the nom regression model is called once for the whole batch.
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from encoders import CompiledEncoder, UNKNOWN_CODE
+from metrics import timed
+
+# Feature order used to train the nom model (keys of feature_encoders 1.pkl)
+ETR_FEATURES = ["msn_id", "Final_Label", "region", "circle", "division", "zone", "tod", "season"]
+# The encoder's msn_id classes are 8-digit numeric meter ids that no column of
+# data.xlsx carries (its Feeder/DTR/Consumer MSNs look like "EZ0801417"), so
+# msn_id encodes to the unknown bucket until the sheet gains that id; predict_etr
+# warns once when that happens.
+MSN_SOURCE_COLUMN = "DTR_MSN"
+HIERARCHY_FEATURES = ["region", "circle", "division", "zone"]
+
+ETR_MIN_MINUTES = 1
+SIMULATED_ETR_RANGE = (30, 180)
+
+_msn_warned = False
+
+
+# -------------------------
+# Calendar features
+# -------------------------
+def time_of_day(hours):
+    hours = np.asarray(hours)
+    return np.select(
+        [(hours >= 5) & (hours < 12), (hours >= 12) & (hours < 17), (hours >= 17) & (hours < 21)],
+        ["Morning", "Afternoon", "Evening"],
+        default="Night",
+    )
+
+
+def season(months):
+    months = np.asarray(months)
+    return np.select([np.isin(months, [4, 5, 6]), np.isin(months, [7, 8, 9])], ["Summer", "Rainy"], default="Winter")
+
+
+# -------------------------
+# Feature frame
+# -------------------------
+def _column(df, name):
+    """Case-insensitive column lookup (REGION / region / Region)."""
+    for c in df.columns:
+        if str(c).lower() == name.lower():
+            return df[c]
+    return pd.Series(np.nan, index=df.index, dtype=object)
+
+
+def build_etr_frame(df, when=None, hierarchy=None):
+    """Raw (unencoded) ETR features for every complaint in ``df``.
+
+    With a ``HierarchyIndex``, region/circle/division are filled in from the
+    zone (or deepest level) the complaint carries.
+    """
+    when = pd.to_datetime(when if when is not None else datetime.now())
+    if np.ndim(when) == 0:
+        hours = np.full(len(df), when.hour)
+        months = np.full(len(df), when.month)
+    else:
+        when = pd.DatetimeIndex(when)
+        hours, months = when.hour.to_numpy(), when.month.to_numpy()
+    location = hierarchy.resolve(df) if hierarchy is not None else df
+    label = df["Predicted_Label"] if "Predicted_Label" in df.columns else _column(df, "Final_Label")
+    frame = pd.DataFrame({
+        "msn_id": _column(df, MSN_SOURCE_COLUMN),
+        "Final_Label": label,
+        **{h: _column(location, h) for h in HIERARCHY_FEATURES},
+        "tod": time_of_day(hours),
+        "season": season(months),
+    }, index=df.index)
+    return frame
+
+
+def encode_features(frame, encoders, columns=None):
+    """One hashed lookup per column; unseen values land in the unknown bucket."""
+    columns = list(columns) if columns is not None else [c for c in ETR_FEATURES if c in encoders]
+    encoded = {}
+    for c in columns:
+        enc = encoders.get(c)
+        if enc is None:
+            encoded[c] = np.full(len(frame), UNKNOWN_CODE, dtype=np.int64)
+            continue
+        if not isinstance(enc, CompiledEncoder):
+            enc = CompiledEncoder.from_label_encoder(enc)
+        encoded[c] = enc.transform(frame[c])
+    return pd.DataFrame(encoded, index=frame.index, columns=columns)
+
+
+def model_features(model, encoders):
+    names = getattr(model, "feature_names_in_", None)
+    if names is not None:
+        return list(names)
+    return [c for c in ETR_FEATURES if c in encoders]
+
+
+# -------------------------
+# Prediction
+# -------------------------
+def simulated_etr(df, rng=None):
+    """Placeholder ETR used when no regression model is available."""
+    rng = rng if rng is not None else np.random.default_rng()
+    lo, hi = SIMULATED_ETR_RANGE
+    minutes = rng.integers(lo, hi + 1, size=len(df))
+    return pd.DataFrame({"ETR_Minutes": minutes, "ETR_Source": "simulated"}, index=df.index)
+
+
+def _check_msn(frame, X, warn):
+    """Warn (once per process) when every meter id falls into the unknown bucket."""
+    global _msn_warned
+    if _msn_warned or "msn_id" not in X.columns or frame["msn_id"].isna().all():
+        return
+    if (X["msn_id"] == UNKNOWN_CODE).all():
+        _msn_warned = True
+        warn(f"No {MSN_SOURCE_COLUMN} value matches the ETR encoder's msn_id classes; "
+             "ETR is predicted without the meter id")
+
+
+def predict_etr(model, encoders, df, when=None, hierarchy=None, warn=None):
+    """ETR minutes for every complaint in ``df`` from one ``model.predict`` call.
+
+    Returns a frame aligned to ``df.index`` with integer ``ETR_Minutes`` and
+    ``ETR_Source`` ("model" or "simulated").
+    """
+    if model is None or df.empty:
+        return simulated_etr(df)
+    with timed("etr_features"):
+        frame = build_etr_frame(df, when, hierarchy)
+        X = encode_features(frame, encoders or {}, model_features(model, encoders or {}))
+    if warn is not None:
+        _check_msn(frame, X, warn)
+    with timed("etr_inference"):
+        minutes = np.asarray(model.predict(X), dtype=np.float64).reshape(-1)
+    minutes = np.maximum(np.rint(np.nan_to_num(minutes, nan=ETR_MIN_MINUTES)), ETR_MIN_MINUTES).astype(np.int64)
+    return pd.DataFrame({"ETR_Minutes": minutes, "ETR_Source": "model"}, index=df.index)
+
+
+def humanize_minutes(minutes):
+    minutes = int(minutes)
+    return f"{minutes // 60} hr {minutes % 60} min" if minutes >= 60 else f"{minutes} min"
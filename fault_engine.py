@@ -0,0 +1,160 @@
+# fault_engine.py
+"""Batch fault labelling over a frame of complaints.
+
+Two paths, both vectorized over the whole fetch:
+
+* ``predict_faults`` turns the complaints into one feature matrix and scores
+  it with a single ``predict_proba`` call on the loaded fault pipeline.
+* ``label_by_rules`` re-implements the rules that produced ``Final_Label`` /
+  ``Label_Reason`` in data.xlsx with NumPy array ops. It needs no trained
+  model, so it is also the fallback when no fault bundle is found.
+"""
+import numpy as np
+import pandas as pd
+
+from complaint_schema import READING_COLUMNS, PING_COLUMNS
+from metrics import timed
+
+FAULT_FEATURES = READING_COLUMNS + PING_COLUMNS
+
+DTR_VOLTAGES = ["d_vr", "d_vy", "d_vb"]
+DTR_CURRENTS = ["d_ir", "d_iy", "d_ib"]
+CONSUMER_VOLTAGES = ["C_tp_vr", "C_tp_vy", "C_tp_vb", "C_sp_v"]
+CONSUMER_CURRENTS = ["C_tp_ir", "C_tp_iy", "C_tp_ib", "C_sp_i"]
+# Ping flag -> ProcessStatus column it mirrors, used when a feed lacks pings
+PING_STATUS = {"F_ping": "Feeder_ProcessStatus", "D_ping": "DTR_ProcessStatus", "C_ping": "Consumer_ProcessStatus"}
+
+VOLT_UNBALANCE_THRESHOLD = 0.30
+
+
+def expected_features(pipeline):
+    """Columns the fitted pipeline was trained on, falling back to the sheet's."""
+    names = getattr(pipeline, "feature_names_in_", None)
+    if names is None and hasattr(pipeline, "steps"):
+        names = getattr(pipeline.steps[0][1], "feature_names_in_", None)
+    return list(names) if names is not None else list(FAULT_FEATURES)
+
+
+def build_feature_matrix(df, columns=None):
+    """Readings as float, ping flags as 0/1; columns missing from ``df`` are NaN."""
+    columns = list(columns) if columns is not None else list(FAULT_FEATURES)
+    X = df.reindex(columns=columns)
+    for c in columns:
+        if c in PING_COLUMNS:
+            X[c] = X[c].fillna(False).astype(np.int8)
+        else:
+            X[c] = pd.to_numeric(X[c], errors="coerce")
+    return X
+
+
+def decode_labels(codes, label_encoder=None):
+    codes = np.asarray(codes)
+    if label_encoder is not None and np.issubdtype(codes.dtype, np.integer):
+        return label_encoder.inverse_transform(codes)
+    return codes
+
+
+def predict_faults(pipeline, label_encoder, df):
+    """Score every complaint in ``df`` at once.
+
+    Returns a frame aligned to ``df.index`` with ``Predicted_Label`` and
+    ``Confidence`` (max class probability, NaN when the model has no
+    ``predict_proba``).
+    """
+    if df.empty:
+        return pd.DataFrame({"Predicted_Label": [], "Confidence": []}, index=df.index)
+    with timed("fault_features"):
+        X = build_feature_matrix(df, expected_features(pipeline))
+    with timed("fault_inference"):
+        if hasattr(pipeline, "predict_proba"):
+            proba = np.asarray(pipeline.predict_proba(X))
+            classes = getattr(pipeline, "classes_", None)
+            best = proba.argmax(axis=1)
+            codes = np.asarray(classes)[best] if classes is not None else pipeline.predict(X)
+            confidence = proba[np.arange(len(best)), best]
+        else:
+            codes = pipeline.predict(X)
+            confidence = np.full(len(X), np.nan)
+    return pd.DataFrame(
+        {"Predicted_Label": decode_labels(codes, label_encoder), "Confidence": confidence},
+        index=df.index,
+    )
+
+
+# -------------------------
+# Rule-based labeller
+# -------------------------
+REASON_DTLT = "One DTR phase current == 0 but not all zero; voltage present"
+REASON_NO_READINGS = "Ping exists but DTR & Consumer readings all NULL"
+REASON_FOC_CURRENT = "Consumer not ping, DTR ping, Consumer currents > 0 => FOC"
+REASON_NO_RULE = "Did not match any rule"
+
+
+def _readings(df, cols):
+    return df.reindex(columns=cols).apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _ping(df, col):
+    if col in df.columns:
+        return df[col].fillna(False).to_numpy(dtype=bool)
+    status = PING_STATUS[col]
+    if status in df.columns:
+        return (df[status].astype(str).str.lower() == "success").to_numpy()
+    return np.zeros(len(df), dtype=bool)
+
+
+def volt_unbalance(dv):
+    """(max - min) / max across the three DTR phase voltages; NaN if any is missing."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vmax = dv.max(axis=1)
+        return (vmax - dv.min(axis=1)) / vmax
+
+
+def label_by_rules(df, threshold=VOLT_UNBALANCE_THRESHOLD):
+    """Label every complaint from its readings and ping pattern.
+
+    Rules are applied in priority order (first match wins), mirroring how
+    data.xlsx was labelled:
+
+    1. DTR voltage unbalance above ``threshold``            -> DTHT_FAULT
+    2. some but not all DTR phase currents zero, voltage on  -> DTLT_FAULT
+    3. something pings but DTR and consumer readings empty   -> FOC_DTHT_FAULT
+    4. consumer silent, DTR pings, consumer currents > 0     -> FOC
+    5. nothing pings                                         -> FEEDER
+    6. DTR pings, consumer silent                            -> FOC
+    7. otherwise                                             -> FOC/DT
+
+    Returns a frame aligned to ``df.index`` with ``Rule_Label`` and
+    ``Rule_Reason`` (None where the sheet records no reason).
+    """
+    dv, di = _readings(df, DTR_VOLTAGES), _readings(df, DTR_CURRENTS)
+    cv, ci = _readings(df, CONSUMER_VOLTAGES), _readings(df, CONSUMER_CURRENTS)
+    f_ping, d_ping, c_ping = _ping(df, "F_ping"), _ping(df, "D_ping"), _ping(df, "C_ping")
+
+    unbalance = volt_unbalance(dv)
+    with np.errstate(invalid="ignore"):
+        dtht = unbalance > threshold
+    zero_i = di == 0
+    dtlt = zero_i.any(axis=1) & ~zero_i.all(axis=1) & (dv > 0).any(axis=1)
+    no_readings = np.isnan(np.hstack([dv, di, cv, ci])).all(axis=1)
+    any_ping = f_ping | d_ping | c_ping
+    ci_present = ~np.isnan(ci)
+    ci_positive = ci_present.any(axis=1) & (np.where(ci_present, ci, np.inf).min(axis=1) > 0)
+
+    conditions = [
+        dtht,
+        dtlt,
+        any_ping & no_readings,
+        ~c_ping & d_ping & ci_positive,
+        ~any_ping,
+        d_ping & ~c_ping,
+    ]
+    labels = np.select(conditions, ["DTHT_FAULT", "DTLT_FAULT", "FOC_DTHT_FAULT", "FOC", "FEEDER", "FOC"],
+                       default="FOC/DT")
+    reasons = np.select(conditions, [None, REASON_DTLT, REASON_NO_READINGS, REASON_FOC_CURRENT, REASON_NO_RULE, None],
+                        default=None).astype(object)
+    if dtht.any():
+        pct = np.round(unbalance[dtht] * 100, 1)
+        fmt = "DTR volt unbalance %.1f%% > " + f"{threshold * 100:g}%%"
+        reasons[dtht] = np.char.mod(fmt, pct).astype(object)
+    return pd.DataFrame({"Rule_Label": labels, "Rule_Reason": reasons}, index=df.index)
@@ -0,0 +1,127 @@
+# file_watch.py
+"""Notice workbooks and models replaced on disk, so they can be hot-reloaded.
+
+The dashboards load data.xlsx, org_hierarchy.xlsx and the model pickles
+once per process; without this a replaced file is only picked up by a
+restart. A ``FileWatcher`` polls each watched file's (mtime, size) from a
+daemon thread. A change is acted on once the file has stopped changing for
+one poll (so a copy in progress is not read half-written), and only if its
+SHA-256 differs from the last one seen, so touching or re-copying the same
+content does nothing. A file that disappears is ignored until it comes
+back, so a deleted workbook does not replace the loaded data. Each watch
+gets the list of its changed paths; the dashboards reload just that
+artifact and swap it in (``Deferred.refresh``).
+"""
+import logging
+import os
+import threading
+
+from data_cache import file_sha256, file_signature
+from metrics import inc
+
+log = logging.getLogger("file_watch")
+
+WATCH_POLL = float(os.environ.get("EOI_WATCH_POLL", "10") or 10)
+
+
+def fingerprint(path):
+    """(signature, sha256) of ``path``, or None when it does not exist."""
+    try:
+        return file_signature(path), file_sha256(path)
+    except OSError:
+        return None
+
+
+class FileWatcher:
+    """Calls ``callback(changed_paths)`` for each watch whose files changed content."""
+
+    def __init__(self, poll=WATCH_POLL):
+        self.poll = poll
+        self._watches = []   # (name, paths, callback)
+        self._known = {}     # path -> fingerprint last acted on
+        self._pending = {}   # path -> signature seen changing, waiting to settle
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, name, paths, callback):
+        """Watch ``paths``; returns self. Files are fingerprinted on the watcher thread.
+
+        ``paths`` may be a callable, called on every poll, for files that are
+        only known once something has loaded (a model found by searching).
+        """
+        with self._lock:
+            self._watches.append((name, paths if callable(paths) else list(paths), callback))
+        return self
+
+    def _current_watches(self):
+        return [(name, list(paths()) if callable(paths) else paths, callback)
+                for name, paths, callback in self._watches]
+
+    def _paths(self, watches):
+        return {p for _, paths, _ in watches for p in paths}
+
+    def _settled_changes(self, watches):
+        changed = set()
+        for path in self._paths(watches):
+            if path not in self._known:
+                self._known[path] = fingerprint(path)
+                continue
+            known = self._known[path]
+            try:
+                sig = file_signature(path)
+            except OSError:
+                sig = None
+            if sig is None:
+                # Deleted (or mid-replace): keep serving the previous version until a file is back
+                self._pending.pop(path, None)
+                continue
+            if sig == (known[0] if known else None):
+                self._pending.pop(path, None)
+                continue
+            if self._pending.get(path, "unseen") != sig:
+                # Still being written (or just appeared): act on it once it stops changing
+                self._pending[path] = sig
+                continue
+            del self._pending[path]
+            current = fingerprint(path)
+            if current is None:
+                continue
+            if known is None or current[1] != known[1]:
+                changed.add(path)
+            self._known[path] = current
+        return changed
+
+    def check(self):
+        """One poll: run the callbacks for settled content changes; returns the changed paths."""
+        with self._lock:
+            watches = self._current_watches()
+            changed = self._settled_changes(watches)
+        for name, paths, callback in watches:
+            hits = [p for p in paths if p in changed]
+            if not hits:
+                continue
+            log.info("%s changed on disk: %s", name, ", ".join(hits))
+            inc("file_changes", watch=name)
+            try:
+                callback(hits)
+            except Exception:
+                log.exception("Reloading %s failed", name)
+        return changed
+
+    def start(self):
+        """Poll from a daemon thread (once); returns self."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="file-watch", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        with self._lock:
+            self._settled_changes(self._current_watches())  # fingerprint everything up front
+        while not self._stop.wait(self.poll):
+            self.check()
@@ -0,0 +1,201 @@
+# hierarchy_index.py
+"""Precomputed region → circle → division → zone index over org_hierarchy.xlsx.
+
+The sheet is turned once into integer-coded nodes per level, each with a
+parent pointer into the level above and a CSR child array into the level
+below. Names are looked up through hashed ``pandas.Index`` tables, so
+resolving a complaint's full location path or rolling a batch up to any
+level is a vectorized ``get_indexer`` plus array takes, not per-row probing
+of ``REGION`` / ``region`` / ``Region`` columns.
+
+Zone names are not unique across the sheet (the same zone can sit under
+more than one circle). A name-only lookup resolves to the first path in
+sheet order; when a frame carries the full path from the root, the exact
+node is matched instead.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_cache import read_excel_cached
+from metrics import timed
+
+LEVELS = ["region", "circle", "division", "zone"]
+# Fallback substrings used when no column contains the full level name
+_SHORT_HINTS = {"region": "reg", "circle": "circ", "division": "div", "zone": "zone"}
+
+
+def detect_columns(columns):
+    """Map each level to the first column whose name contains it (case-insensitive)."""
+    col_map = {}
+    for level in LEVELS:
+        for hint in (level, _SHORT_HINTS[level]):
+            match = next((c for c in columns if hint in str(c).lower()), None)
+            if match is not None:
+                col_map[level] = match
+                break
+    return col_map
+
+
+def find_level_columns(df):
+    """Columns of ``df`` holding each level, matched case-insensitively by exact name."""
+    lower = {str(c).lower(): c for c in df.columns}
+    return {level: lower[level] for level in LEVELS if level in lower}
+
+
+class HierarchyIndex:
+    """Integer-coded hierarchy with parent pointers and child arrays.
+
+    For every level present in the sheet:
+
+    * ``names[level]``    - node names, indexed by node id
+    * ``parent[level]``   - node id in the level above (-1 at the root level)
+    * ``children[level]`` - ``(offsets, ids)``; the children of node ``i`` are
+      ``ids[offsets[i]:offsets[i + 1]]`` in the level below
+    """
+
+    def __init__(self, df, col_map=None):
+        df = df if df is not None else pd.DataFrame()
+        col_map = col_map if col_map is not None else detect_columns(df.columns)
+        self.levels = [lvl for lvl in LEVELS if lvl in col_map]
+        self.names, self.parent, self.children = {}, {}, {}
+        self._paths, self._by_name = {}, {}
+
+        table = df[[col_map[lvl] for lvl in self.levels]].astype(str) if self.levels else pd.DataFrame()
+        table.columns = self.levels
+        parent_codes = np.full(len(table), -1, dtype=np.int64)
+        for depth, level in enumerate(self.levels):
+            keys = pd.MultiIndex.from_arrays([parent_codes, table[level].to_numpy()])
+            codes, uniques = pd.factorize(keys)
+            self.names[level] = np.asarray(uniques.get_level_values(1), dtype=object)
+            self.parent[level] = np.asarray(uniques.get_level_values(0), dtype=np.int64)
+            first_rows = pd.Series(np.arange(len(codes))).groupby(codes, sort=True).first().to_numpy()
+            # Full path from the root per node, used for exact (non-ambiguous) matches
+            self._paths[level] = pd.MultiIndex.from_frame(table.iloc[first_rows][self.levels[:depth + 1]])
+            # First node in sheet order for each bare name
+            first = pd.Series(np.arange(len(uniques))).groupby(self.names[level], sort=False).first()
+            self._by_name[level] = (pd.Index(first.index, dtype=object), first.to_numpy(dtype=np.int64))
+            parent_codes = codes
+        for upper, lower in zip(self.levels, self.levels[1:]):
+            parents = self.parent[lower]
+            order = np.argsort(parents, kind="stable")
+            counts = np.bincount(parents, minlength=len(self.names[upper]))
+            self.children[upper] = (np.concatenate([[0], np.cumsum(counts)]), order)
+        if self.levels:
+            self.children[self.levels[-1]] = (np.zeros(len(self.names[self.levels[-1]]) + 1, dtype=np.int64),
+                                              np.array([], dtype=np.int64))
+
+    @classmethod
+    def from_file(cls, path):
+        """Index over an org hierarchy sheet; empty when the file is missing."""
+        if not os.path.exists(path):
+            return cls(pd.DataFrame(), {})
+        df = read_excel_cached(path).fillna("")
+        return cls(df, detect_columns(df.columns))
+
+    def __len__(self):
+        return len(self.names[self.levels[-1]]) if self.levels else 0
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    # -------------------------
+    # Node lookups
+    # -------------------------
+    def node_ids(self, level, names):
+        """Node ids for bare ``names`` at ``level`` (-1 where unknown)."""
+        if level not in self.names:
+            return np.full(len(names), -1, dtype=np.int64)
+        keys = pd.Index(np.asarray(names, dtype=object)).astype(str)
+        index, first = self._by_name[level]
+        pos = index.get_indexer(keys)
+        return np.where(pos >= 0, first[np.clip(pos, 0, None)] if len(first) else -1, -1).astype(np.int64)
+
+    def path_ids(self, level, frame):
+        """Node ids for rows of ``frame`` whose columns hold the path root..``level``."""
+        cols = self.levels[:self.levels.index(level) + 1]
+        keys = pd.MultiIndex.from_frame(frame[cols].astype(str))
+        return self._paths[level].get_indexer(keys).astype(np.int64)
+
+    def ancestors(self, level, ids, target):
+        """Map node ``ids`` at ``level`` up to their ancestor ids at ``target``."""
+        ids = np.asarray(ids, dtype=np.int64)
+        depth = self.levels.index(level)
+        for lvl in reversed(self.levels[self.levels.index(target) + 1:depth + 1]):
+            parent = self.parent[lvl]
+            ids = np.where(ids >= 0, parent[np.clip(ids, 0, None)] if len(parent) else -1, -1)
+        return ids
+
+    def child_names(self, level, node_id):
+        offsets, ids = self.children[level]
+        below = self.levels[self.levels.index(level) + 1]
+        return list(self.names[below][ids[offsets[node_id]:offsets[node_id + 1]]])
+
+    def path(self, zone):
+        """Full ``{level: name}`` path for a single zone name (first match)."""
+        leaf = self.levels[-1] if self.levels else None
+        ids = self.node_ids(leaf, [zone]) if leaf else np.array([-1])
+        if ids[0] < 0:
+            return {}
+        return {lvl: self.names[lvl][self.ancestors(leaf, ids, lvl)[0]] for lvl in self.levels}
+
+    # -------------------------
+    # Batch operations
+    # -------------------------
+    def resolve(self, df):
+        """Location path for every complaint in ``df``.
+
+        Uses the deepest level column ``df`` carries (REGION / region / ...
+        all match); when every level above it is present too, the exact node
+        is matched. Returns a frame aligned to ``df.index`` with one column
+        per level plus ``node_id`` (-1 where the name is unknown; the
+        complaint's own values are kept in that case).
+        """
+        with timed("hierarchy_resolve"):
+            return self._resolve(df)
+
+    def _resolve(self, df):
+        present = find_level_columns(df)
+        out = pd.DataFrame(index=df.index)
+        known = [lvl for lvl in self.levels if lvl in present]
+        if not known:
+            # Nothing to resolve against: pass the complaint's own levels through
+            for lvl in LEVELS:
+                if lvl in present:
+                    out[lvl] = df[present[lvl]]
+            out["node_id"] = -1
+            return out
+        deepest = known[-1]
+        frame = df[[present[lvl] for lvl in known]].copy()
+        frame.columns = known
+        if known == self.levels[:len(known)]:
+            ids = self.path_ids(deepest, frame)
+        else:
+            ids = self.node_ids(deepest, frame[deepest].to_numpy())
+        hit = ids >= 0
+        for lvl in self.levels[:self.levels.index(deepest) + 1]:
+            anc = self.ancestors(deepest, ids, lvl)
+            names = self.names[lvl][np.clip(anc, 0, None)] if len(self.names[lvl]) else np.full(len(anc), None)
+            own = frame[lvl].to_numpy(dtype=object) if lvl in frame.columns else np.full(len(anc), np.nan, dtype=object)
+            out[lvl] = np.where(hit, names, own)
+        out["node_id"] = ids
+        return out
+
+    def rollup(self, df, level, weights=None):
+        """Complaint count (or summed ``weights``) per node at ``level``.
+
+        Returns a Series indexed by node name, highest first; complaints whose
+        location is unknown are dropped.
+        """
+        resolved = self.resolve(df)
+        if level not in resolved.columns:
+            return pd.Series(dtype=np.float64 if weights is not None else np.int64)
+        present = [lvl for lvl in self.levels if lvl in resolved.columns]
+        ids = self.ancestors(present[-1], resolved["node_id"].to_numpy(), level)
+        keep = ids >= 0
+        w = None if weights is None else np.asarray(weights, dtype=np.float64)[keep]
+        totals = np.bincount(ids[keep], weights=w, minlength=len(self.names[level]))
+        out = pd.Series(totals, index=pd.Index(self.names[level], name=level))
+        return out[out > 0].groupby(level=0, sort=False).sum().sort_values(ascending=False)
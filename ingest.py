@@ -0,0 +1,135 @@
+# ingest.py
+"""Streaming complaint ingestion.
+
+Complaints are read in bounded chunks from an xlsx (openpyxl read-only
+mode), CSV, JSON-lines or Parquet source and yielded as typed DataFrame
+batches, so memory stays flat as the archive grows and the first batch is
+available before the rest of the file has been parsed.
+"""
+import os
+import random
+
+import pandas as pd
+
+from complaint_schema import ID_COLUMNS, coerce_types, concat_batches
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+# -------------------------
+# Per-format readers (raw batches)
+# -------------------------
+def _iter_xlsx(path, batch_size):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(h) for h in header]
+        buf = []
+        for row in rows:
+            if not any(v is not None for v in row):
+                continue
+            buf.append(row)
+            if len(buf) >= batch_size:
+                yield pd.DataFrame(buf, columns=columns)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=columns)
+    finally:
+        wb.close()
+
+
+def _iter_csv(path, batch_size):
+    dtypes = {c: str for c in ID_COLUMNS}
+    yield from pd.read_csv(path, chunksize=batch_size, dtype=dtypes)
+
+
+def _iter_jsonl(path, batch_size):
+    with pd.read_json(path, lines=True, chunksize=batch_size, dtype=False) as reader:
+        yield from reader
+
+
+def _iter_parquet(path, batch_size):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield batch.to_pandas()
+
+
+_READERS = {
+    ".xlsx": _iter_xlsx,
+    ".xlsm": _iter_xlsx,
+    ".csv": _iter_csv,
+    ".jsonl": _iter_jsonl,
+    ".ndjson": _iter_jsonl,
+    ".parquet": _iter_parquet,
+}
+
+
+# -------------------------
+# Typed batch pipeline
+# -------------------------
+def iter_complaint_batches(path, batch_size=DEFAULT_BATCH_SIZE, failures=None):
+    """Yield typed complaint batches of at most ``batch_size`` rows.
+
+    Each batch is indexed by its row position in the source file, so rows
+    keep a stable id across batches. ``failures`` (a Counter) collects
+    unparseable readings per column.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    reader = _READERS.get(ext)
+    if reader is None:
+        raise ValueError(f"Unsupported complaint source: {path}")
+    offset = 0
+    for raw in reader(path, batch_size):
+        raw.index = pd.RangeIndex(offset, offset + len(raw))
+        offset += len(raw)
+        yield coerce_types(raw, failures=failures)
+
+
+class ComplaintFeed:
+    """Pull-based view over a complaint source, used by the intake service's ``--replay``.
+
+    Holds at most one batch in memory. ``next(n)`` hands out ``n`` complaints
+    from the current batch (randomly when ``shuffle`` is set) and reads the
+    next batch only once the current one is used up, restarting from the top
+    of the file at the end.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE, shuffle=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self._batches = None
+        self._pending = pd.DataFrame()
+
+    def _refill(self):
+        if self._batches is None:
+            self._batches = iter_complaint_batches(self.path, self.batch_size)
+        batch = next(self._batches, None)
+        if batch is None:
+            # End of file: wrap around like a replayed feed.
+            self._batches = iter_complaint_batches(self.path, self.batch_size)
+            batch = next(self._batches, None)
+        if batch is None:
+            return False
+        if self.shuffle:
+            batch = batch.sample(frac=1, random_state=random.randrange(2**32))
+        self._pending = concat_batches([self._pending, batch]) if not self._pending.empty else batch
+        return True
+
+    def next(self, n):
+        while len(self._pending) < n:
+            if not self._refill():
+                break
+        out, self._pending = self._pending.iloc[:n], self._pending.iloc[n:]
+        return out
+
+    def close(self):
+        if self._batches is not None:
+            self._batches.close()
+            self._batches = None
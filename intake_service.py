@@ -0,0 +1,429 @@
+# intake_service.py
+"""Long-running complaint intake service with micro-batched scoring.
+
+Complaints are POSTed as JSON to a small asyncio HTTP server and queued. A
+single batcher task gathers them into micro-batches, closing a batch when it
+reaches ``batch_size`` complaints or when its oldest complaint has waited
+``max_delay_ms``, and scores each batch with one fault-model and one ETR
+call (``pipeline.score_batch``). Scoring runs on the event loop between I/O
+bursts: a batch costs ~15 ms however many complaints it holds, and a worker
+thread would fight the loop for the GIL and starve request handling. Scored
+results are kept in a bounded, sequenced buffer the dashboards read from.
+
+    python intake_service.py --port 8765
+    python intake_service.py --port 8765 --replay data.xlsx --rate 200
+
+Endpoints:
+
+    POST /complaints         one complaint object or a list; ``?wait=1`` blocks
+                             until they are scored and returns the results
+    GET  /results            ``?since=<seq>&limit=<n>`` scored complaints after a
+                             sequence watermark (newest ``limit`` by default)
+    GET  /results/<id>       result for one Request_Id
+    GET  /health             queue depth, batch and latency statistics
+    GET  /metrics            per-stage latency histograms and counters (Prometheus text)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from urllib.request import urlopen, Request
+
+import numpy as np
+import pandas as pd
+
+from complaint_schema import coerce_types
+from metrics import METRICS, inc, timed
+from hierarchy_index import HierarchyIndex
+from ingest import ComplaintFeed
+from model_registry import get_registry
+from pipeline import (
+    DEFAULT_SEARCH_DIR, DEFAULT_FAULT_CANDIDATES, DEFAULT_ETR_MODEL_PATH, DEFAULT_ETR_ENCODERS_PATH,
+    DEFAULT_HIERARCHY_PATH, score_batch,
+)
+
+log = logging.getLogger("intake_service")
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_DELAY_MS = 50
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_MAX_RESULTS = 50000
+LATENCY_WINDOW = 10000
+MAX_BODY_BYTES = 16 << 20
+
+
+# -------------------------
+# Results buffer
+# -------------------------
+def _json_records(df):
+    """JSON-safe records: NaN/NaT -> None, NumPy scalars -> Python."""
+    df = df.astype(object).where(df.notna(), None)
+    return [{k: (v.item() if isinstance(v, np.generic) else v) for k, v in rec.items()}
+            for rec in df.to_dict(orient="records")]
+
+
+class ResultBuffer:
+    """Bounded, sequence-numbered store of scored complaints (oldest evicted)."""
+
+    def __init__(self, max_results=DEFAULT_MAX_RESULTS):
+        self.max_results = max_results
+        self._by_seq = OrderedDict()
+        self._seq_by_id = {}
+        self.last_seq = 0
+
+    def add(self, records):
+        for rec in records:
+            self.last_seq += 1
+            rec["Seq"] = self.last_seq
+            old = self._seq_by_id.get(rec["Request_Id"])
+            if old is not None:
+                self._by_seq.pop(old, None)
+            self._by_seq[self.last_seq] = rec
+            self._seq_by_id[rec["Request_Id"]] = self.last_seq
+        while len(self._by_seq) > self.max_results:
+            _, rec = self._by_seq.popitem(last=False)
+            if self._seq_by_id.get(rec["Request_Id"]) == rec["Seq"]:
+                del self._seq_by_id[rec["Request_Id"]]
+
+    def since(self, seq=None, limit=100):
+        if seq is None:
+            return list(self._by_seq.values())[-limit:] if limit else []
+        out = []
+        for s in reversed(self._by_seq):
+            if s <= seq:
+                break
+            out.append(self._by_seq[s])
+        return out[::-1][:limit]
+
+    def get(self, request_id):
+        seq = self._seq_by_id.get(request_id)
+        return self._by_seq.get(seq) if seq is not None else None
+
+    def __len__(self):
+        return len(self._by_seq)
+
+
+# -------------------------
+# Micro-batcher
+# -------------------------
+class MicroBatcher:
+    """Queue complaints and score them in size- or deadline-bounded batches."""
+
+    def __init__(self, registry, hierarchy=None, batch_size=DEFAULT_BATCH_SIZE,
+                 max_delay_ms=DEFAULT_MAX_DELAY_MS, queue_size=DEFAULT_QUEUE_SIZE,
+                 max_results=DEFAULT_MAX_RESULTS):
+        self.registry = registry
+        self.hierarchy = hierarchy
+        self.batch_size = batch_size
+        self.max_delay = max_delay_ms / 1000.0
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.results = ResultBuffer(max_results)
+        self.latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self.batches = 0
+        self.scored = 0
+        self.rejected = 0
+        self._next_id = 0
+
+    def submit(self, records):
+        """Enqueue complaint dicts; returns (futures, ids). Raises QueueFull on overload."""
+        if self.queue.maxsize and self.queue.qsize() + len(records) > self.queue.maxsize:
+            self.rejected += len(records)
+            inc("complaints_rejected", len(records))
+            raise asyncio.QueueFull()
+        loop = asyncio.get_running_loop()
+        futures, ids = [], []
+        for rec in records:
+            rec = dict(rec)
+            if not rec.get("Request_Id"):
+                self._next_id += 1
+                rec["Request_Id"] = f"INT_{self._next_id}"
+            fut = loop.create_future()
+            self.queue.put_nowait((time.perf_counter(), rec, fut))
+            futures.append(fut)
+            ids.append(str(rec["Request_Id"]))
+        inc("complaints_received", len(records))
+        return futures, ids
+
+    async def _collect(self):
+        first = await self.queue.get()
+        batch = [first]
+        deadline = first[0] + self.max_delay
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _score(self, records):
+        with timed("intake_batch"):
+            df = coerce_types(pd.DataFrame.from_records(records))
+            return score_batch(df, self.registry, self.hierarchy, datetime.now())
+
+    async def run(self):
+        while True:
+            batch = await self._collect()
+            enqueued, records, futures = zip(*batch)
+            try:
+                scored = self._score(list(records))
+                out = _json_records(scored)
+            except Exception as e:
+                log.exception("Scoring failed for a batch of %d", len(batch))
+                for fut in futures:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            done = time.perf_counter()
+            stamp = datetime.now().isoformat(timespec="milliseconds")
+            for t0, rec in zip(enqueued, out):
+                rec["Latency_ms"] = round((done - t0) * 1000, 3)
+                rec["Scored_At"] = stamp
+                self.latencies_ms.append(rec["Latency_ms"])
+            self.results.add(out)
+            for fut, rec in zip(futures, out):
+                if not fut.done():
+                    fut.set_result(rec)
+            self.batches += 1
+            self.scored += len(out)
+
+    def stats(self):
+        lat = np.asarray(self.latencies_ms, dtype=np.float64)
+        pct = {f"p{q}_ms": round(float(np.percentile(lat, q)), 3) if len(lat) else None for q in (50, 95, 99)}
+        return {
+            "queue_depth": self.queue.qsize(),
+            "batches": self.batches,
+            "scored": self.scored,
+            "rejected": self.rejected,
+            "mean_batch": round(self.scored / self.batches, 2) if self.batches else None,
+            "results_buffered": len(self.results),
+            "last_seq": self.results.last_seq,
+            "fault_model": self.registry.fault_source or "rules",
+            "etr_model": self.registry.etr_source or "simulated",
+            **pct,
+        }
+
+
+# -------------------------
+# HTTP front end
+# -------------------------
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+def _response(status, payload, keep_alive=True):
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+    else:
+        body, content_type = json.dumps(payload, default=str, allow_nan=False).encode("utf-8"), "application/json"
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("ascii") + body
+
+
+def _parse_records(body):
+    text = body.decode("utf-8").strip()
+    if not text:
+        return []
+    try:
+        data = json.loads(text)
+    except ValueError:
+        # JSON lines
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict):
+        data = data.get("complaints", [data])
+    if not isinstance(data, list) or not all(isinstance(r, dict) for r in data):
+        raise ValueError("expected a complaint object, a list of them, or JSON lines")
+    return data
+
+
+class IntakeServer:
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle(self, method, path, query, body):
+        if path == "/complaints":
+            if method != "POST":
+                return 405, {"error": "POST complaints here"}
+            try:
+                records = _parse_records(body)
+            except ValueError as e:
+                return 400, {"error": str(e)}
+            try:
+                futures, ids = self.batcher.submit(records)
+            except asyncio.QueueFull:
+                return 503, {"error": "intake queue full, retry later", "queue_depth": self.batcher.queue.qsize()}
+            if query.get("wait", ["0"])[0] in ("1", "true"):
+                try:
+                    return 200, {"results": list(await asyncio.gather(*futures))}
+                except Exception as e:
+                    return 500, {"error": f"scoring failed: {e}"}
+            return 202, {"accepted": len(ids), "ids": ids}
+        if method != "GET":
+            return 405, {"error": "method not allowed"}
+        if path == "/results":
+            since = query.get("since", [None])[0]
+            limit = query.get("limit", ["100"])[0]
+            try:
+                since = int(since) if since is not None else None
+                limit = int(limit)
+            except ValueError:
+                return 400, {"error": "since and limit must be integers"}
+            if limit < 0:
+                return 400, {"error": "limit must not be negative"}
+            rows = self.batcher.results.since(since, limit)
+            return 200, {"last_seq": self.batcher.results.last_seq, "results": rows}
+        if path.startswith("/results/"):
+            rec = self.batcher.results.get(path[len("/results/"):])
+            return (200, rec) if rec is not None else (404, {"error": "unknown Request_Id"})
+        if path == "/health":
+            return 200, self.batcher.stats()
+        if path == "/metrics":
+            return 200, METRICS.prometheus_text()
+        return 404, {"error": "not found"}
+
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    writer.write(_response(400, {"error": "bad request line"}, keep_alive=False))
+                    break
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b"\r\n", b"\n", b""):
+                        break
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+                length = int(headers.get("content-length", "0") or 0)
+                if length > MAX_BODY_BYTES:
+                    writer.write(_response(413, {"error": "body too large"}, keep_alive=False))
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                url = urlsplit(target)
+                try:
+                    status, payload = await self.handle(method.upper(), url.path.rstrip("/") or "/",
+                                                        parse_qs(url.query), body)
+                except Exception as e:
+                    log.exception("Request failed")
+                    status, payload = 500, {"error": str(e)}
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def replay(batcher, path, rate):
+    """Feed complaints from ``path`` into the queue at ``rate`` per second (demo/dev)."""
+    feed = ComplaintFeed(path, shuffle=False)
+    interval = 0.1
+    per_tick = max(1, int(round(rate * interval)))
+    n = 0
+    while True:
+        df = feed.next(per_tick)
+        if df.empty:
+            return
+        # Re-id replayed rows so every pass over the file counts as new complaints
+        df = df.assign(Request_Id=[f"{rid}#{n + i}" for i, rid in enumerate(df["Request_Id"].astype(str))])
+        n += len(df)
+        try:
+            batcher.submit(_json_records(df))
+        except asyncio.QueueFull:
+            pass
+        await asyncio.sleep(interval)
+
+
+async def serve(args):
+    registry = get_registry(args.fault_model or DEFAULT_FAULT_CANDIDATES, args.etr_model, args.encoders,
+                            search_dir=args.search_dir)
+    for msg in registry.warnings:
+        log.warning(msg)
+    batcher = MicroBatcher(registry, HierarchyIndex.from_file(args.hierarchy), args.batch_size,
+                           args.max_delay_ms, args.queue_size, args.max_results)
+    server = IntakeServer(batcher)
+    tasks = [asyncio.create_task(batcher.run())]
+    if args.replay:
+        tasks.append(asyncio.create_task(replay(batcher, args.replay, args.rate)))
+    srv = await asyncio.start_server(server.serve_connection, args.host, args.port)
+    log.info("Intake service on http://%s:%d (batch %d / %d ms)", args.host, args.port,
+             args.batch_size, args.max_delay_ms)
+    async with srv:
+        await srv.serve_forever()
+
+
+# -------------------------
+# Client helpers (used by the dashboards)
+# -------------------------
+def fetch_results(base_url, limit=100, since=None, timeout=5):
+    """Scored complaints from a running service as a DataFrame (newest ``limit``)."""
+    query = f"limit={int(limit)}" + (f"&since={int(since)}" if since is not None else "")
+    with urlopen(Request(f"{base_url.rstrip('/')}/results?{query}"), timeout=timeout) as resp:
+        payload = json.load(resp)
+    df = pd.DataFrame.from_records(payload.get("results", []))
+    return coerce_types(df) if not df.empty else df
+
+
+def post_complaints(base_url, records, wait=False, timeout=30):
+    body = json.dumps(records, default=str).encode("utf-8")
+    req = Request(f"{base_url.rstrip('/')}/complaints{'?wait=1' if wait else ''}", data=body,
+                  headers={"Content-Type": "application/json"}, method="POST")
+    with urlopen(req, timeout=timeout) as resp:
+        return json.load(resp)
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description="Complaint intake service with micro-batched fault + ETR scoring.")
+    p.add_argument("--host", default=DEFAULT_HOST)
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="max complaints per model call")
+    p.add_argument("--max-delay-ms", type=float, default=DEFAULT_MAX_DELAY_MS,
+                   help="max time the oldest queued complaint waits for its batch to fill")
+    p.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="pending complaints before 503")
+    p.add_argument("--max-results", type=int, default=DEFAULT_MAX_RESULTS, help="scored results kept for readers")
+    p.add_argument("--replay", help="feed complaints from this file (dev/demo)")
+    p.add_argument("--rate", type=float, default=50, help="replayed complaints per second")
+    p.add_argument("--fault-model", action="append")
+    p.add_argument("--search-dir", default=DEFAULT_SEARCH_DIR)
+    p.add_argument("--etr-model", default=DEFAULT_ETR_MODEL_PATH)
+    p.add_argument("--encoders", default=DEFAULT_ETR_ENCODERS_PATH)
+    p.add_argument("--hierarchy", default=DEFAULT_HIERARCHY_PATH)
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    if args.replay and not os.path.exists(args.replay):
+        log.error("Replay file not found: %s", args.replay)
+        return 2
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
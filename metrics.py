@@ -0,0 +1,213 @@
+# metrics.py
+"""Per-stage latency histograms and counters for the scoring hot path.
+
+Library code wraps each stage in ``timed("stage")``; the numbers live in one
+process-wide registry shared by every dashboard session, the intake service
+and batch_score.py. ``snapshot`` feeds the sidebar metrics panel and
+``prometheus_text`` renders the same registry in the Prometheus text
+exposition format, either written to a file (node_exporter textfile
+collector, ``EOI_METRICS_FILE``) or served on ``/metrics``
+(``EOI_METRICS_PORT`` on ``EOI_METRICS_HOST``, default 127.0.0.1, or the
+intake service's own port).
+
+Quantiles (p50/p95/p99) are computed over the most recent ``WINDOW``
+observations per stage; bucket counts, sums and counts are cumulative.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+PREFIX = "eoi"
+WINDOW = 1024
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+METRICS_FILE = os.environ.get("EOI_METRICS_FILE")
+METRICS_PORT = int(os.environ.get("EOI_METRICS_PORT", "0") or 0)
+# /metrics is only reachable locally unless a wider bind address is set
+METRICS_HOST = os.environ.get("EOI_METRICS_HOST", "127.0.0.1")
+
+
+class LatencyHistogram:
+    """Cumulative bucket counts plus a window of recent samples for quantiles."""
+
+    def __init__(self, buckets=BUCKETS, window=WINDOW):
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def quantiles(self, qs=QUANTILES):
+        if not self.recent:
+            return {q: float("nan") for q in qs}
+        values = np.percentile(np.fromiter(self.recent, dtype=np.float64), [q * 100 for q in qs])
+        return dict(zip(qs, values.tolist()))
+
+
+class MetricsRegistry:
+    """Thread-safe counters (with labels) and per-stage latency histograms."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}    # name -> {labels tuple: value}
+        self._histograms = {}  # stage -> LatencyHistogram
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self._histograms.get(stage)
+            if hist is None:
+                hist = self._histograms[stage] = LatencyHistogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        """Record the wall time of the ``with`` block under ``stage`` (errors too)."""
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+    # -------------------------
+    # Views
+    # -------------------------
+    def snapshot(self):
+        """One row per stage: count, p50/p95/p99/max in ms and total seconds."""
+        with self._lock:
+            rows = []
+            for stage, hist in sorted(self._histograms.items()):
+                q = hist.quantiles()
+                rows.append({
+                    "stage": stage,
+                    "count": hist.count,
+                    "p50_ms": q[0.5] * 1000,
+                    "p95_ms": q[0.95] * 1000,
+                    "p99_ms": q[0.99] * 1000,
+                    "max_ms": hist.max * 1000,
+                    "total_s": hist.sum,
+                })
+        return pd.DataFrame(rows, columns=["stage", "count", "p50_ms", "p95_ms", "p99_ms", "max_ms", "total_s"])
+
+    def counters(self):
+        """Flat ``{"name{label=value}": total}`` view of every counter."""
+        out = {}
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                for key, value in series.items():
+                    out[name + _labels(dict(key))] = value
+        return out
+
+    def prometheus_text(self):
+        """Every counter and histogram in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{PREFIX}_{name}_total"
+                lines += [f"# TYPE {metric} counter"]
+                lines += [f"{metric}{_labels(dict(key))} {_num(v)}" for key, v in series.items()]
+            if self._histograms:
+                metric = f"{PREFIX}_stage_seconds"
+                lines += [f"# HELP {metric} Wall time per pipeline stage.", f"# TYPE {metric} histogram"]
+                for stage, hist in sorted(self._histograms.items()):
+                    cumulative = 0
+                    for bound, n in zip(hist.buckets, hist.bucket_counts):
+                        cumulative += n
+                        lines.append(f'{metric}_bucket{_labels({"stage": stage, "le": _num(bound)})} {cumulative}')
+                    lines.append(f'{metric}_bucket{_labels({"stage": stage, "le": "+Inf"})} {hist.count}')
+                    lines.append(f'{metric}_sum{_labels({"stage": stage})} {_num(hist.sum)}')
+                    lines.append(f'{metric}_count{_labels({"stage": stage})} {hist.count}')
+                metric = f"{PREFIX}_stage_latency_seconds"
+                lines += [f"# HELP {metric} Recent-window latency quantiles per pipeline stage.",
+                          f"# TYPE {metric} gauge"]
+                for stage, hist in sorted(self._histograms.items()):
+                    for q, v in hist.quantiles().items():
+                        lines.append(f'{metric}{_labels({"stage": stage, "quantile": _num(q)})} {_num(v)}')
+        lines.append(f"{PREFIX}_uptime_seconds {_num(time.time() - self.started)}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically (re)write ``path`` with ``prometheus_text()``."""
+        tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _num(v):
+    if v != v:
+        return "NaN"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+# -------------------------
+# Process-wide registry
+# -------------------------
+METRICS = MetricsRegistry()
+timed = METRICS.timed
+inc = METRICS.inc
+observe = METRICS.observe
+
+
+def serve_metrics(port, registry=METRICS, host=METRICS_HOST):
+    """Serve ``GET /metrics`` from a daemon thread; returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,361 @@
+# model_registry.py
+"""One warm, process-wide registry for the fault model, ETR model and encoders.
+
+Artifacts are loaded through joblib with ``mmap_mode='r'``. A pickle (or
+compressed joblib file) cannot be memory-mapped, so on first load it is
+re-dumped once, uncompressed, under ``.cache/models``. Later loads map that
+copy, and the NumPy arrays held as plain attributes of estimators and
+encoders then live in the OS page cache, shared read-only by every dashboard
+worker on the host instead of being copied into each process. (sklearn tree
+nodes are copied into Cython buffers on unpickle and stay per-process.)
+
+``SEARCH_DIR`` is indexed by a JSON manifest (name, size, mtime, sha256,
+type, feature schema) instead of trial-unpickling every matching file.
+
+When an artifact is replaced on disk, ``reload_registry`` reloads just that
+artifact and swaps a new registry in; the old one is never mutated.
+"""
+import os
+import json
+import fnmatch
+import hashlib
+import pickle
+import threading
+from dataclasses import dataclass, field, replace
+
+try:
+    import joblib
+except ImportError:
+    joblib = None
+
+from data_cache import CACHE_DIR, file_sha256
+from encoders import compile_encoders
+from metrics import timed
+
+SEARCH_PATTERNS = ["*fault*.pkl", "*best*.pkl", "*classifier*.pkl", "*pipe*.pkl", "*model*.pkl",
+                   "*fault*.joblib", "*best*.joblib", "*classifier*.joblib", "*model*.joblib", "*.pkl", "*.joblib"]
+
+
+# -------------------------
+# Artifact loading
+# -------------------------
+def _plain_load(path):
+    # joblib reads plain pickles too; plain pickle.load would silently return
+    # a truncated object for joblib files, so it is only the last resort.
+    if joblib is not None:
+        try:
+            return joblib.load(path)
+        except Exception:
+            pass
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def mmap_copy_path(path, cache_dir=CACHE_DIR):
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+    return os.path.join(cache_dir, "models", f"{stem}-{file_sha256(path)[:16]}.joblib")
+
+
+def load_artifact(path, mmap=True, cache_dir=CACHE_DIR):
+    """Load a pickled/joblib artifact, memory-mapping its arrays when possible."""
+    if not mmap or joblib is None:
+        return _plain_load(path)
+    copy = mmap_copy_path(path, cache_dir)
+    if os.path.exists(copy):
+        try:
+            return joblib.load(copy, mmap_mode="r")
+        except Exception:
+            pass
+    return _mmap_copy(_plain_load(path), copy)
+
+
+def _mmap_copy(obj, copy):
+    """Re-dump ``obj`` uncompressed at ``copy`` and map it back (``obj`` itself if that fails)."""
+    try:
+        os.makedirs(os.path.dirname(copy), exist_ok=True)
+        tmp = f"{copy}.tmp-{os.getpid()}"
+        joblib.dump(obj, tmp, compress=0)
+        os.replace(tmp, copy)
+        return joblib.load(copy, mmap_mode="r")
+    except Exception:
+        # Unwritable cache dir: fall back to a private in-memory copy
+        return obj
+
+
+def split_fault_bundle(bundle):
+    """(pipeline, label_encoder) from either a bare estimator or a bundle dict."""
+    if bundle is None:
+        return None, None
+    if isinstance(bundle, dict):
+        return bundle.get("pipeline", bundle), bundle.get("label_encoder", None)
+    return bundle, None
+
+
+# -------------------------
+# SEARCH_DIR manifest
+# -------------------------
+def _manifest_path(search_dir, cache_dir=CACHE_DIR):
+    tag = hashlib.sha1(os.path.abspath(search_dir).encode("utf-8")).hexdigest()[:10]
+    return os.path.join(cache_dir, f"model_manifest-{tag}.json")
+
+
+def _sniff_format(path):
+    with open(path, "rb") as f:
+        head = f.read(6)
+    if head[:1] == b"\x80":
+        return "pickle"
+    if head[:2] in (b"\x1f\x8b", b"ZF") or head[:1] == b"\x78" or head[:6] == b"\xfd7zXZ":
+        return "joblib-compressed"
+    return "unknown"
+
+
+def describe_artifact(obj):
+    """Type, task and feature schema recorded in the manifest after a load."""
+    pipeline, label_encoder = split_fault_bundle(obj)
+    # classes_ alone is not enough: a bare LabelEncoder has it but cannot predict
+    if hasattr(pipeline, "predict_proba") or (hasattr(pipeline, "predict") and hasattr(pipeline, "classes_")):
+        task = "classifier"
+    elif hasattr(pipeline, "predict"):
+        task = "regressor"
+    else:
+        task = "other"
+    names = getattr(pipeline, "feature_names_in_", None)
+    if names is None and hasattr(pipeline, "steps"):
+        names = getattr(pipeline.steps[0][1], "feature_names_in_", None)
+    return {
+        "type": f"{type(pipeline).__module__}.{type(pipeline).__name__}",
+        "task": task,
+        "has_label_encoder": label_encoder is not None,
+        "features": [str(n) for n in names] if names is not None else None,
+        "n_features": int(getattr(pipeline, "n_features_in_", 0)) or None,
+    }
+
+
+def _write_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)
+
+
+def build_manifest(search_dir, cache_dir=CACHE_DIR):
+    """Index of candidate artifacts in ``search_dir`` without unpickling any.
+
+    Entries carry name, size, mtime, sha256 and on-disk format, ranked by the
+    old fnmatch pattern order. Entries whose mtime/size are unchanged are
+    reused as-is (including type/feature schema learned from an earlier
+    load); new or changed files are re-hashed and their schema reset.
+    """
+    path = _manifest_path(search_dir, cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            old = {e["name"]: e for e in json.load(f).get("artifacts", [])}
+    except (OSError, ValueError, KeyError):
+        old = {}
+    files = sorted(os.listdir(search_dir)) if os.path.isdir(search_dir) else []
+    entries, seen = [], set()
+    for rank, pat in enumerate(SEARCH_PATTERNS):
+        for fname in fnmatch.filter(files, pat):
+            if fname in seen:
+                continue
+            seen.add(fname)
+            full = os.path.join(search_dir, fname)
+            st = os.stat(full)
+            prev = old.get(fname)
+            if prev and prev.get("mtime_ns") == st.st_mtime_ns and prev.get("size") == st.st_size:
+                entries.append(dict(prev, rank=rank))
+                continue
+            entries.append({
+                "name": fname,
+                "path": full,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "sha256": file_sha256(full),
+                "format": _sniff_format(full),
+                "rank": rank,
+                "schema": None,
+            })
+    if entries != list(old.values()):
+        try:
+            _write_manifest(path, {"search_dir": os.path.abspath(search_dir), "artifacts": entries})
+        except OSError:
+            pass
+    return entries
+
+
+def record_schema(search_dir, name, schema, cache_dir=CACHE_DIR):
+    path = _manifest_path(search_dir, cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        for e in manifest.get("artifacts", []):
+            if e["name"] == name:
+                e["schema"] = schema
+        _write_manifest(path, manifest)
+    except (OSError, ValueError, KeyError):
+        pass
+
+
+def discover_fault_artifact(search_dir, mmap=True, cache_dir=CACHE_DIR):
+    """Open the fault classifier in ``search_dir`` using the manifest.
+
+    Artifacts already known to be something other than a classifier are
+    skipped without being opened, so once the manifest has seen the
+    directory, startup deserializes exactly one file. Files not seen before
+    are trial-loaded without a memory-mapped copy; only the classifier that
+    is picked gets one. Files that are neither pickles nor joblib archives
+    (``format`` "unknown") are never opened.
+    """
+    entries = build_manifest(search_dir, cache_dir)
+    known = [e for e in entries if (e.get("schema") or {}).get("task") == "classifier"]
+    unknown = [e for e in entries if e.get("schema") is None]
+    picked = {e["name"] for e in known}
+    for e in known + unknown:
+        if e.get("format") == "unknown":
+            record_schema(search_dir, e["name"], {"task": "unloadable"}, cache_dir)
+            continue
+        try:
+            obj = load_artifact(e["path"], mmap=mmap and e["name"] in picked, cache_dir=cache_dir)
+        except Exception:
+            record_schema(search_dir, e["name"], {"task": "unloadable"}, cache_dir)
+            continue
+        schema = describe_artifact(obj)
+        if e.get("schema") != schema:
+            record_schema(search_dir, e["name"], schema, cache_dir)
+        if schema["task"] == "classifier":
+            if mmap and e["name"] not in picked and joblib is not None:
+                obj = _mmap_copy(obj, mmap_copy_path(e["path"], cache_dir))
+            return obj, e["path"]
+    return None, None
+
+
+def load_fault_bundle(candidates, search_dir=None, mmap=True):
+    """First loadable artifact from ``candidates``, else the indexed ``search_dir``.
+
+    Returns ``(bundle, path)`` or ``(None, None)``.
+    """
+    for p in candidates:
+        if os.path.exists(p):
+            try:
+                return load_artifact(p, mmap=mmap), p
+            except Exception:
+                continue
+    if search_dir and os.path.isdir(search_dir):
+        return discover_fault_artifact(search_dir, mmap=mmap)
+    return None, None
+
+
+def _load_nom_model(path, mmap, warnings):
+    if os.path.exists(path):
+        try:
+            return load_artifact(path, mmap=mmap)
+        except Exception as e:
+            warnings.append(f"Could not load nom model from {path}: {e}")
+    return None
+
+
+def _load_encoders(enc_path, mmap, warnings):
+    if os.path.exists(enc_path):
+        try:
+            return compile_encoders(load_artifact(enc_path, mmap=mmap))
+        except Exception as e:
+            warnings.append(f"Could not load encoders from {enc_path}: {e}")
+    return {}
+
+
+def load_nom_artifacts(path, enc_path, mmap=True):
+    """(model, compiled encoders, warnings) for the ETR step."""
+    if joblib is None:
+        return None, {}, ["joblib not available - ETR model disabled"]
+    warnings = []
+    model = _load_nom_model(path, mmap, warnings)
+    enc = _load_encoders(enc_path, mmap, warnings)
+    return model, enc, warnings
+
+
+# -------------------------
+# Registry
+# -------------------------
+@dataclass
+class ModelRegistry:
+    fault_pipeline: object = None
+    fault_label_encoder: object = None
+    fault_source: str = None
+    etr_model: object = None
+    etr_encoders: dict = field(default_factory=dict)
+    etr_source: str = None
+    warnings: list = field(default_factory=list)
+
+    @property
+    def fault_ready(self):
+        return self.fault_pipeline is not None
+
+    @property
+    def etr_ready(self):
+        return self.etr_model is not None
+
+    @classmethod
+    def load(cls, fault_candidates, etr_model_path, etr_encoders_path, search_dir=None, mmap=True):
+        with timed("model_load"):
+            bundle, fault_source = load_fault_bundle(fault_candidates, search_dir, mmap=mmap)
+            pipeline, label_encoder = split_fault_bundle(bundle)
+            model, enc, warnings = load_nom_artifacts(etr_model_path, etr_encoders_path, mmap=mmap)
+        return cls(
+            fault_pipeline=pipeline,
+            fault_label_encoder=label_encoder,
+            fault_source=fault_source,
+            etr_model=model,
+            etr_encoders=enc,
+            etr_source=etr_model_path if model is not None else None,
+            warnings=warnings,
+        )
+
+
+_registries = {}
+_registry_lock = threading.Lock()
+
+
+def _registry_key(fault_candidates, etr_model_path, etr_encoders_path, search_dir, mmap):
+    return tuple(fault_candidates), etr_model_path, etr_encoders_path, search_dir, mmap
+
+
+def get_registry(fault_candidates, etr_model_path, etr_encoders_path, search_dir=None, mmap=True):
+    """The process-wide registry for this configuration, loaded on first use."""
+    key = _registry_key(fault_candidates, etr_model_path, etr_encoders_path, search_dir, mmap)
+    with _registry_lock:
+        reg = _registries.get(key)
+        if reg is None:
+            reg = ModelRegistry.load(fault_candidates, etr_model_path, etr_encoders_path, search_dir, mmap)
+            _registries[key] = reg
+        return reg
+
+
+def reload_registry(fault_candidates, etr_model_path, etr_encoders_path, search_dir=None, mmap=True, changed=()):
+    """A new registry with only the artifacts in ``changed`` reloaded, swapped in for this configuration.
+
+    The previous registry object is left untouched, so callers still holding
+    it keep a consistent set of models.
+    """
+    key = _registry_key(fault_candidates, etr_model_path, etr_encoders_path, search_dir, mmap)
+    with _registry_lock:
+        old = _registries.get(key)
+    if old is None:
+        return get_registry(fault_candidates, etr_model_path, etr_encoders_path, search_dir, mmap)
+    changed = {os.path.abspath(p) for p in changed}
+    fault_paths = [*fault_candidates, *([old.fault_source] if old.fault_source else [])]
+    updates, warnings = {}, []
+    with timed("model_load"):
+        if any(os.path.abspath(p) in changed for p in fault_paths):
+            bundle, source = load_fault_bundle(fault_candidates, search_dir, mmap=mmap)
+            pipeline, label_encoder = split_fault_bundle(bundle)
+            updates.update(fault_pipeline=pipeline, fault_label_encoder=label_encoder, fault_source=source)
+        if joblib is not None and os.path.abspath(etr_model_path) in changed:
+            model = _load_nom_model(etr_model_path, mmap, warnings)
+            updates.update(etr_model=model, etr_source=etr_model_path if model is not None else None)
+        if joblib is not None and os.path.abspath(etr_encoders_path) in changed:
+            updates.update(etr_encoders=_load_encoders(etr_encoders_path, mmap, warnings))
+    reg = replace(old, warnings=warnings, **updates)
+    with _registry_lock:
+        _registries[key] = reg
+    return reg
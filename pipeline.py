@@ -0,0 +1,83 @@
+# pipeline.py
+"""Streamlit-free fault → ETR scoring shared by the dashboards and batch_score.py.
+
+Every step works on a whole batch: rule labels and the fault model are
+applied with one vectorized pass / one ``predict_proba`` call, and ETR with
+one ``predict`` call. Model failures degrade the same way the dashboards
+always have (rule label, simulated ETR) and are reported through ``warn``.
+"""
+import logging
+
+import numpy as np
+
+from fault_engine import predict_faults, label_by_rules
+from etr_engine import predict_etr, simulated_etr
+from metrics import inc, timed
+
+log = logging.getLogger(__name__)
+
+# Default artifact locations, matching the dashboards' constants
+DEFAULT_SEARCH_DIR = "/mnt/data"
+DEFAULT_FAULT_CANDIDATES = [
+    "best_model.pkl",
+    "fault_model.pkl",
+    "fault_classifier.pkl",
+    "best_fault_model.pkl",
+    "fault_pipe.pkl",
+    "best_model.joblib",
+    "fault_model.joblib",
+]
+DEFAULT_ETR_MODEL_PATH = "nom_regression_model.pkl"
+DEFAULT_ETR_ENCODERS_PATH = "feature_encoders 1.pkl"
+DEFAULT_HIERARCHY_PATH = "org_hierarchy.xlsx"
+
+FAULT_RESULT_COLUMNS = ["Rule_Label", "Rule_Reason", "Predicted_Label", "Confidence"]
+ETR_RESULT_COLUMNS = ["ETR_Minutes", "ETR_Source"]
+RESULT_COLUMNS = FAULT_RESULT_COLUMNS + ETR_RESULT_COLUMNS
+# Columns carried into batch output alongside the results
+KEY_COLUMNS = ["Request_Id", "Feeder_MSN", "DTR_MSN", "Consumer_MSN", "Final_Label"]
+
+
+def already_scored(df):
+    """Boolean mask of rows that arrived with results (scored by the intake service)."""
+    if "ETR_Source" not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df["ETR_Source"].notna().to_numpy()
+
+
+def classify(df, pipeline=None, label_encoder=None, warn=log.warning):
+    """Attach rule labels plus Predicted_Label/Confidence for the whole batch.
+
+    The fault model is called once for the batch; without a model (or if it
+    fails) the vectorized rule engine's label is used instead.
+    """
+    df = df.drop(columns=FAULT_RESULT_COLUMNS, errors="ignore")
+    with timed("fault_rules"):
+        df = df.join(label_by_rules(df))
+    if pipeline is not None:
+        try:
+            return df.join(predict_faults(pipeline, label_encoder, df))
+        except Exception as e:
+            inc("model_fallbacks", stage="fault")
+            warn(f"Fault model prediction failed, using rule-based labels: {e}")
+    return df.assign(Predicted_Label=df["Rule_Label"], Confidence=np.nan)
+
+
+def estimate_etr(df, model=None, encoders=None, hierarchy=None, when=None, warn=log.warning):
+    """ETR minutes for the whole batch from one nom-model predict call."""
+    try:
+        return predict_etr(model, encoders, df, when=when, hierarchy=hierarchy, warn=warn)
+    except Exception as e:
+        inc("model_fallbacks", stage="etr")
+        warn(f"ETR model prediction failed, using simulated ETR: {e}")
+        return simulated_etr(df)
+
+
+def score_batch(df, registry, hierarchy=None, when=None, warn=log.warning):
+    """Classify and estimate ETR for ``df`` with the models in ``registry``.
+
+    Returns ``df`` with the ``RESULT_COLUMNS`` appended, index preserved.
+    """
+    df = classify(df, registry.fault_pipeline, registry.fault_label_encoder, warn=warn)
+    etr = estimate_etr(df, registry.etr_model, registry.etr_encoders, hierarchy, when, warn=warn)
+    return df.drop(columns=list(etr.columns), errors="ignore").join(etr)
@@ -0,0 +1,257 @@
+# profiling.py
+"""Profile a whole dashboard workflow run in place.
+
+The four workflow steps (fetch, analyze, detailed analysis, ETR) are spread
+over several Streamlit reruns, so a ``WorkflowProfiler`` lives in the
+session: each script run calls ``resume()`` at the top and ``pause()`` at the
+end (or before ``st.rerun()``), and ``finish()`` once the ETR step is done.
+Time spent waiting for clicks between runs is not recorded.
+
+Three things are collected while the profiler is running:
+
+* a deterministic profile (``cProfile``, mode ``"cprofile"``) written as a
+  ``.prof`` file for ``pstats`` / snakeviz;
+* stack samples taken every ``SAMPLE_INTERVAL`` seconds from the script
+  thread, written as a ``.collapsed`` file (one ``frame;frame;frame count``
+  line per stack) for flamegraph.pl or speedscope. Mode ``"sampling"``
+  collects only these, at a much lower overhead;
+* ``tracemalloc`` snapshots at the start and the end, written as a
+  ``.tracemalloc`` snapshot plus an ``.alloc.txt`` report of the largest
+  allocation growth by source line.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import Counter
+
+import pandas as pd
+
+from data_cache import CACHE_DIR
+
+PROFILE_DIR = os.environ.get("EOI_PROFILE_DIR", os.path.join(CACHE_DIR, "profiles"))
+PROFILE_MODES = ("cprofile", "sampling")
+SAMPLE_INTERVAL = 0.005
+TOP_N = 25
+
+_trace_lock = threading.Lock()
+_trace_users = 0
+# the profiler's own bookkeeping is left out of allocation reports
+_TRACE_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def _trace_acquire():
+    """Start tracemalloc for the first concurrent profiler (it is process-wide)."""
+    global _trace_users
+    with _trace_lock:
+        if _trace_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _trace_users = 1
+        elif _trace_users:
+            _trace_users += 1
+
+
+def _trace_release():
+    global _trace_users
+    with _trace_lock:
+        if _trace_users:
+            _trace_users -= 1
+            if _trace_users == 0:
+                tracemalloc.stop()
+
+
+def frame_label(name, filename, lineno):
+    """``func (file.py:12)`` -- the frame name used in profiles and stacks."""
+    if filename in ("~", ""):
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+# -------------------------
+# Stack sampling
+# -------------------------
+class StackSampler:
+    """Samples one thread's Python stack from a daemon thread."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()  # "root;...;leaf" -> samples
+        self.thread_id = None    # None while paused
+        self._stop = threading.Event()
+        self._thread = None
+
+    def target(self, thread_id):
+        self.thread_id = thread_id
+        if self._thread is None:
+            # the loop only holds a weak reference, so a dropped sampler stops itself
+            self._thread = threading.Thread(target=_sample_loop, args=(weakref.ref(self), self._stop, self.interval),
+                                            name="profile-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.thread_id = None
+        if self._thread is not None:
+            self._thread.join()
+
+    def sample(self):
+        tid = self.thread_id
+        frame = sys._current_frames().get(tid) if tid is not None else None
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(frame_label(code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        self.stacks[";".join(reversed(stack))] += 1
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed-stack format, heaviest stacks first."""
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def top_functions(self, n=TOP_N):
+        """Hottest frames by self samples, with inclusive samples, in seconds."""
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for f in set(frames):
+                total[f] += count
+        rows = [{"function": f, "calls": None, "self_s": c * self.interval, "cumulative_s": total[f] * self.interval}
+                for f, c in own.most_common(n)]
+        return pd.DataFrame(rows, columns=["function", "calls", "self_s", "cumulative_s"])
+
+
+def _sample_loop(ref, stop, interval):
+    while not stop.wait(interval):
+        sampler = ref()
+        if sampler is None:
+            return
+        sampler.sample()
+        del sampler
+
+
+# -------------------------
+# Workflow profiler
+# -------------------------
+class WorkflowProfiler:
+    """cProfile + stack samples + tracemalloc across the reruns of one workflow."""
+
+    def __init__(self, name="workflow", mode="cprofile", out_dir=PROFILE_DIR, interval=SAMPLE_INTERVAL,
+                 trace_memory=True):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {PROFILE_MODES}, got {mode!r}")
+        self.name = name
+        self.mode = mode
+        self.out_dir = out_dir
+        self.started_at = time.time()
+        self.wall_s = 0.0
+        self.runs = 0
+        self.sampler = StackSampler(interval)
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        self._resumed = None
+        self._baseline = None
+        if trace_memory:
+            _trace_acquire()
+            self._baseline = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            self._untrace = weakref.finalize(self, _trace_release)
+
+    @property
+    def active(self):
+        return self._resumed is not None
+
+    def resume(self):
+        """Start recording on the calling (script) thread."""
+        if self.active:
+            self.pause()
+        self.runs += 1
+        self._resumed = time.perf_counter()
+        self.sampler.target(threading.get_ident())
+        if self.profile is not None:
+            try:
+                self.profile.enable()
+            except ValueError:
+                # another profiler owns the interpreter hook (Python 3.12+): keep the samples only
+                self.profile, self.mode = None, "sampling"
+
+    def pause(self):
+        if not self.active:
+            return
+        if self.profile is not None:
+            self.profile.disable()
+        self.sampler.thread_id = None
+        self.wall_s += time.perf_counter() - self._resumed
+        self._resumed = None
+
+    def top_functions(self, n=TOP_N):
+        """Hottest functions by self time (cProfile when available, else samples)."""
+        if self.profile is None:
+            return self.sampler.top_functions(n)
+        stats = pstats.Stats(self.profile).stats
+        rows = [{"function": frame_label(name, filename, line), "calls": nc, "self_s": tt, "cumulative_s": ct}
+                for (filename, line, name), (cc, nc, tt, ct, callers) in stats.items()]
+        df = pd.DataFrame(rows, columns=["function", "calls", "self_s", "cumulative_s"])
+        return df.sort_values("self_s", ascending=False).head(n).reset_index(drop=True)
+
+    def finish(self, n=TOP_N):
+        """Stop, write the profile files and return a summary for the dashboard."""
+        self.pause()
+        self.sampler.stop()
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started_at))
+        base = os.path.join(self.out_dir, f"{self.name}-{stamp}-{os.getpid()}")
+        files = {}
+
+        if self.profile is not None:
+            files["profile"] = base + ".prof"
+            self.profile.dump_stats(files["profile"])
+        files["collapsed"] = base + ".collapsed"
+        with open(files["collapsed"], "w") as f:
+            f.write(self.sampler.collapsed())
+
+        allocations, peak_mb = pd.DataFrame(columns=["location", "size_kb", "count"]), None
+        if self._baseline is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+            peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            self._untrace()
+            diff = snapshot.compare_to(self._baseline, "lineno")[:n]
+            allocations = pd.DataFrame([
+                {"location": f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+                 "size_kb": s.size_diff / 1024, "count": s.count_diff}
+                for s in diff
+            ], columns=["location", "size_kb", "count"])
+            files["snapshot"] = base + ".tracemalloc"
+            snapshot.dump(files["snapshot"])
+            files["allocations"] = base + ".alloc.txt"
+            with open(files["allocations"], "w") as f:
+                f.write(f"# peak traced memory: {peak_mb:.1f} MB\n")
+                f.writelines(f"{s}\n" for s in diff)
+
+        return {
+            "name": self.name,
+            "mode": self.mode,
+            "runs": self.runs,
+            "wall_s": self.wall_s,
+            "samples": self.sampler.samples,
+            "peak_mb": peak_mb,
+            "files": files,
+            "top": self.top_functions(n),
+            "allocations": allocations,
+        }
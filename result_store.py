@@ -0,0 +1,111 @@
+# result_store.py
+"""Scored results keyed by Request_Id, so reruns only score new complaints.
+
+Streamlit replays the whole script on every interaction. Routing the
+classify and ETR steps through a ``ResultStore`` means a complaint is scored
+the first time it is seen and every later rerun reuses its stored result:
+the cost of a refresh is proportional to new arrivals, not to the backlog
+already on screen. Rows are held in plain dicts per stage, so lookups and
+inserts are O(rows requested) regardless of how much the store holds.
+
+One store is shared by every dashboard session (``st.cache_resource``), so a
+complaint scored for one dispatcher is reused by the others. A lock guards
+the stored rows only (scoring runs outside it), and ``last_run`` is tracked
+per calling thread (one Streamlit script run).
+
+Results depend on the models and data they were scored with, which can be
+hot-reloaded. ``apply`` takes a ``version`` tuple (one counter per input);
+once a newer version is seen the stage's stored rows are dropped, and a
+script run still scoring with an older version gets its results without
+reading or writing the store.
+"""
+import threading
+from collections import Counter, OrderedDict
+
+import pandas as pd
+
+from metrics import inc
+
+DEFAULT_MAX_ROWS = 100000
+
+
+class ResultStore:
+    """Per-stage ``Request_Id -> result row`` store with LRU eviction."""
+
+    def __init__(self, max_rows=DEFAULT_MAX_ROWS, key="Request_Id"):
+        self.max_rows = max_rows
+        self.key = key
+        self._rows = {}      # stage -> OrderedDict(id -> tuple)
+        self._columns = {}   # stage -> result column names
+        self._versions = {}  # stage -> newest version seen (per input)
+        self.stats = Counter()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+    def __len__(self):
+        return max((len(r) for r in self._rows.values()), default=0)
+
+    def _ids(self, df):
+        if self.key in df.columns:
+            return df[self.key].astype(str).tolist()
+        return [str(i) for i in df.index]
+
+    def _current(self, stage, version):
+        latest = self._versions.get(stage)
+        newest = version if latest is None else tuple(max(a, b) for a, b in zip(latest, version))
+        if newest != latest:
+            if latest is not None:
+                # scored with inputs that have since been replaced
+                self._rows.pop(stage, None)
+            self._versions[stage] = newest
+        return version == newest
+
+    def apply(self, stage, df, score_fn, version=None):
+        """Results for every row of ``df``, scoring only the rows not yet seen.
+
+        ``score_fn(new_rows)`` must return a frame aligned to ``new_rows.index``
+        holding just the result columns. Returns those columns for all of
+        ``df``, aligned to ``df.index``. With a ``version`` older than one
+        already seen for ``stage`` every row is scored and nothing is stored.
+        ``score_fn`` runs outside the lock, so sessions score concurrently.
+        """
+        ids = self._ids(df)
+        with self._lock:
+            current = version is None or self._current(stage, tuple(version))
+            rows = self._rows.setdefault(stage, OrderedDict()) if current else {}
+            found = {}
+            for rid in ids:
+                if rid in rows:
+                    rows.move_to_end(rid)
+                    found[rid] = rows[rid]
+        hit = [i in found for i in ids]
+        new = df[[not h for h in hit]]
+        if len(new):
+            scored = score_fn(new)
+            with self._lock:
+                cols = self._columns.setdefault(stage, list(scored.columns))
+                values = dict(zip(self._ids(new), scored[cols].itertuples(index=False, name=None)))
+                if version is None or self._current(stage, tuple(version)):
+                    rows = self._rows.setdefault(stage, OrderedDict())
+                    rows.update(values)
+                    while len(rows) > self.max_rows:
+                        rows.popitem(last=False)
+            found.update(values)
+        out = pd.DataFrame([found[i] for i in ids], index=df.index, columns=self._columns.get(stage, []))
+        reused = len(df) - len(new)
+        with self._lock:
+            self.stats[f"{stage}:scored"] += len(new)
+            self.stats[f"{stage}:reused"] += reused
+        inc("complaints_scored", len(new), stage=stage)
+        inc("complaints_reused", reused, stage=stage)
+        self._last_runs()[stage] = (len(new), reused)
+        return out
+
+    def _last_runs(self):
+        if not hasattr(self._local, "last"):
+            self._local.last = {}
+        return self._local.last
+
+    def last_run(self, stage):
+        """(scored, reused) row counts from this thread's latest ``apply`` for ``stage``."""
+        return self._last_runs().get(stage, (0, 0))
@@ -0,0 +1,207 @@
+# shared_table.py
+"""One complaint table shared by every dashboard session.
+
+Each Streamlit session used to keep its own DataFrames in ``st.session_state``
+(the fetch, the analyzed copy, a list of ETR dicts), and ``st.cache_data``
+handed every caller a fresh unpickled copy of the sheet. A ``ComplaintTable``
+is loaded once per process (``st.cache_resource``) and is append-only: rows
+are never modified or removed, so a row id stays valid for as long as the
+table lives. A session keeps a ``SessionView`` with the row ids it fetched
+and its results as compact arrays, so per-session memory is a few index and
+result arrays rather than a copy of the data.
+
+Views hold a lease on the table. The lease is released when the view is
+garbage collected (session closed or reset), so ``sessions`` is the number of
+live dispatcher sessions using the table.
+
+Rows interned from the intake service carry their results. A Request_Id
+that comes back with a new ``version`` (the service's ``Seq``) is appended
+again and the id points at the newest row; the older row stays valid for
+views that hold it. Interned rows beyond ``max_interned`` are evicted, oldest
+chunk first, once no live view holds them.
+"""
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from complaint_schema import concat_batches
+
+DEFAULT_MAX_INTERNED = 100000
+
+
+class ComplaintTable:
+    """Append-only complaint rows, addressed by integer row id."""
+
+    def __init__(self, frame=None, key="Request_Id", source=None, max_interned=DEFAULT_MAX_INTERNED):
+        self.key = key
+        self.max_interned = max_interned
+        self._lock = threading.Lock()
+        self._chunks = []      # read-only frames (None once evicted); rows are never changed in place
+        self._starts = []      # first row id of each chunk
+        self._pos = {}         # Request_Id -> newest row id
+        self._views = weakref.WeakSet()
+        self.n_rows = 0
+        self.interned = 0      # live rows appended after the base load
+        self.sessions = 0
+        self.meta = {"source": source, "loaded_at": time.time(), "base_rows": 0}
+        if frame is not None and len(frame):
+            self.intern(frame)
+            self.meta["base_rows"] = self.n_rows
+            self.interned = 0
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def columns(self):
+        return next((c.columns for c in self._chunks if c is not None), pd.Index([]))
+
+    def intern(self, df, version=None):
+        """Row ids for ``df``, appending rows whose Request_Id is not in the table yet.
+
+        With ``version`` (a column of ``df``), a known Request_Id whose stored
+        row has a different value in that column is appended again.
+        """
+        ids = df[self.key].astype(str).tolist() if self.key in df.columns else None
+        with self._lock:
+            if ids is None:
+                new = np.ones(len(df), dtype=bool)
+            else:
+                new = np.array([i not in self._pos for i in ids], dtype=bool)
+                if version is not None and version in df.columns:
+                    new |= [not new[k] and not self._same(self._pos[i], version, v)
+                            for k, (i, v) in enumerate(zip(ids, df[version]))]
+                # a Request_Id repeated within df is stored once
+                new &= ~pd.Series(ids).duplicated().to_numpy()
+            if new.any():
+                chunk = df[new].reset_index(drop=True)
+                chunk.index = pd.RangeIndex(self.n_rows, self.n_rows + len(chunk))
+                self._chunks.append(chunk)
+                self._starts.append(self.n_rows)
+                if ids is not None:
+                    self._pos.update(zip(chunk[self.key].astype(str), chunk.index))
+                self.n_rows += len(chunk)
+                self.interned += len(chunk)
+            if ids is None:
+                rows = np.arange(self.n_rows - len(df), self.n_rows, dtype=np.int64)
+            else:
+                rows = np.fromiter((self._pos[i] for i in ids), dtype=np.int64, count=len(ids))
+            self._evict(keep=rows)
+            return rows
+
+    def _row(self, row):
+        c = int(np.searchsorted(self._starts, row, side="right")) - 1
+        return self._chunks[c].loc[row]
+
+    def _same(self, row, column, value):
+        stored = self._row(row).get(column, np.nan)
+        return (pd.isna(stored) and pd.isna(value)) or stored == value
+
+    def _evict(self, keep=()):
+        """Drop the oldest interned chunks no live view (or ``keep``) holds, down to ``max_interned``."""
+        if self.interned <= self.max_interned:
+            return
+        held = set(np.asarray(keep).tolist())
+        for view in list(self._views):
+            held.update(view.rows.tolist())
+        first = 1 if self.meta["base_rows"] else 0
+        for c in range(first, len(self._chunks)):
+            chunk = self._chunks[c]
+            if chunk is None or held.intersection(chunk.index):
+                continue
+            for rid, row in zip(chunk[self.key].astype(str), chunk.index):
+                if self._pos.get(rid) == row:
+                    del self._pos[rid]
+            self._chunks[c] = None
+            self.interned -= len(chunk)
+            if self.interned <= self.max_interned:
+                break
+
+    def take(self, rows):
+        """Rows ``rows`` (in that order) as a new frame indexed by row id."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(rows) or not self._chunks:
+            return pd.DataFrame(columns=self.columns)
+        chunks, starts = self._chunks, np.asarray(self._starts)
+        which = np.searchsorted(starts, rows, side="right") - 1
+        if (which == which[0]).all():
+            return chunks[which[0]].iloc[rows - starts[which[0]]]
+        order = np.argsort(which, kind="stable")
+        parts = [chunks[c].iloc[rows[which == c] - starts[c]] for c in np.unique(which)]
+        return concat_batches(parts).iloc[np.argsort(order, kind="stable")]
+
+    def sample(self, n, rng=None):
+        """``n`` random row ids from the rows the table was loaded with."""
+        rng = rng or np.random.default_rng()
+        base = self.meta["base_rows"] or self.n_rows
+        return rng.choice(base, size=min(n, base), replace=False).astype(np.int64)
+
+    def view(self, rows):
+        return SessionView(self, rows)
+
+    def _acquire(self, view):
+        with self._lock:
+            self.sessions += 1
+            self._views.add(view)
+
+    def _release(self):
+        with self._lock:
+            self.sessions -= 1
+
+
+class SessionView:
+    """One session's fetch: row ids into a ``ComplaintTable`` plus result arrays."""
+
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.results = {}  # column -> array aligned to rows
+        table._acquire(self)
+        weakref.finalize(self, table._release)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def empty(self):
+        return len(self.rows) == 0
+
+    def set_results(self, df):
+        """Keep ``df``'s columns (aligned to the view) as compact arrays."""
+        for c in df.columns:
+            s = df[c]
+            if s.dtype == object or isinstance(s.dtype, pd.CategoricalDtype):
+                self.results[c] = pd.Categorical(s)
+            elif s.dtype == np.float64:
+                self.results[c] = s.to_numpy(dtype=np.float32)
+            elif s.dtype == np.int64 and (not len(s) or s.abs().max() < 2**31):
+                self.results[c] = s.to_numpy(dtype=np.int32)
+            else:
+                self.results[c] = s.to_numpy()
+
+    def has(self, *columns):
+        return all(c in self.results for c in columns)
+
+    def result_frame(self, columns=None):
+        columns = [c for c in (columns or self.results) if c in self.results]
+        return pd.DataFrame({c: self.results[c] for c in columns}, index=pd.Index(self.rows))
+
+    def frame(self, columns=None):
+        """The fetched complaints with any stored results joined in."""
+        df = self.table.take(self.rows)
+        columns = [c for c in (columns or self.results) if c in self.results]
+        return df.assign(**{c: self.results[c] for c in columns})
+
+    def records(self, columns):
+        """List of dicts holding just ``columns`` (table or result columns)."""
+        df = self.frame([c for c in columns if c in self.results])
+        return df[[c for c in columns if c in df.columns]].to_dict("records")
+
+    def nbytes(self):
+        total = self.rows.nbytes
+        for values in self.results.values():
+            total += values.nbytes if hasattr(values, "nbytes") else 0
+        return total
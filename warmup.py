@@ -0,0 +1,228 @@
+# warmup.py
+"""Warm the load caches before the first dispatcher arrives.
+
+The dashboards fill their caches on first use: the first run after a
+restart parses the workbooks (or reads their columnar cache), re-dumps the
+model pickles for memory-mapping and imports scikit-learn while unpickling.
+A ``CacheWarmer`` does that work ahead of time, and then keeps polling the
+files so a replaced workbook or model is re-cached as soon as it lands
+instead of by the next user. With ``interval`` set it also re-warms
+everything on a schedule.
+
+    python warmup.py                     # fill the on-disk caches and exit
+    python warmup.py --watch             # ... then keep them fresh
+    python warmup.py --serve app.py      # warm in this process, then run the dashboard in it
+
+``--serve`` then executes the dashboard script once, outside a session,
+before starting the server: its own ``startup_loads`` (model registry with
+the script's configuration, complaint table, hierarchy index) run and land
+in the process-wide ``st.cache_resource``, so the first page view finds them
+ready. Once running, a dashboard reloads changed files itself
+(file_watch.py), which refills these caches.
+"""
+import argparse
+import logging
+import os
+import runpy
+import sys
+import threading
+import time
+
+from data_cache import file_signature, read_excel_cached
+from metrics import inc, timed
+from model_registry import get_registry, load_artifact
+from pipeline import (
+    DEFAULT_SEARCH_DIR, DEFAULT_FAULT_CANDIDATES, DEFAULT_ETR_MODEL_PATH, DEFAULT_ETR_ENCODERS_PATH,
+    DEFAULT_HIERARCHY_PATH,
+)
+
+log = logging.getLogger("warmup")
+
+DEFAULT_WORKBOOKS = ["data.xlsx", DEFAULT_HIERARCHY_PATH]
+# Seconds between file checks, and between full re-warms (0 = only on change)
+WARMUP_POLL = float(os.environ.get("EOI_WARMUP_POLL", "30") or 30)
+WARMUP_INTERVAL = float(os.environ.get("EOI_WARMUP_INTERVAL", "0") or 0)
+
+
+def _signature(path):
+    try:
+        return file_signature(path)
+    except OSError:
+        return None
+
+
+class CacheWarmer:
+    """Warms workbook and model caches, then re-warms files that change."""
+
+    def __init__(self, workbooks, fault_candidates, etr_model_path, etr_encoders_path, search_dir=None,
+                 poll=WARMUP_POLL, interval=WARMUP_INTERVAL, registry=True):
+        self.workbooks = list(workbooks)
+        self.fault_candidates = list(fault_candidates)
+        self.etr_model_path = etr_model_path
+        self.etr_encoders_path = etr_encoders_path
+        self.search_dir = search_dir
+        self.poll = poll
+        self.interval = interval
+        self.registry = registry  # False: only the on-disk model copies are warmed
+        self.status = {}  # path -> {"kind", "seconds", "warmed_at", "error"}
+        self.last_full = None
+        self._signatures = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def models(self):
+        return [*self.fault_candidates, self.etr_model_path, self.etr_encoders_path]
+
+    def _warm_file(self, path, kind):
+        t = time.perf_counter()
+        error = None
+        try:
+            with timed("warmup"):
+                if kind == "workbook":
+                    read_excel_cached(path)
+                else:
+                    load_artifact(path)
+        except Exception as e:
+            error = str(e)
+            log.warning("Could not warm %s: %s", path, e)
+        inc("warmups", kind=kind)
+        self.status[path] = {"kind": kind, "seconds": time.perf_counter() - t, "warmed_at": time.time(),
+                             "error": error}
+
+    def warm(self):
+        """Warm every workbook and the model registry; returns ``status``."""
+        with self._lock:
+            self._signatures = {p: _signature(p) for p in self.workbooks + self.models}
+            for path in self.workbooks:
+                if os.path.exists(path):
+                    self._warm_file(path, "workbook")
+            if self.last_full is not None or not self.registry:
+                # Without a (fresh) registry load below, warm the artifacts' mmap copies directly
+                for path in self.models:
+                    if os.path.exists(path):
+                        self._warm_file(path, "model")
+            if not self.registry:
+                self.last_full = time.time()
+                return self.status
+            t = time.perf_counter()
+            with timed("warmup"):
+                registry = get_registry(self.fault_candidates, self.etr_model_path, self.etr_encoders_path,
+                                        search_dir=self.search_dir)
+            inc("warmups", kind="registry")
+            for msg in registry.warnings:
+                log.warning(msg)
+            self.status["registry"] = {"kind": "registry", "seconds": time.perf_counter() - t,
+                                       "warmed_at": time.time(), "error": None}
+            self.last_full = time.time()
+        return self.status
+
+    def check(self):
+        """Re-warm the files whose (mtime, size) changed; returns their paths."""
+        if self.interval and self.last_full and time.time() - self.last_full >= self.interval:
+            self.warm()
+            return list(self._signatures)
+        changed = []
+        with self._lock:
+            for path in self.workbooks + self.models:
+                sig = _signature(path)
+                if sig == self._signatures.get(path):
+                    continue
+                self._signatures[path] = sig
+                if sig is not None:
+                    self._warm_file(path, "workbook" if path in self.workbooks else "model")
+                    changed.append(path)
+        for path in changed:
+            log.info("Re-warmed %s", path)
+        return changed
+
+    def start(self, warm_now=True):
+        """Run the watcher on a daemon thread (warming first if ``warm_now``); returns self."""
+        with self._lock:
+            if self._thread is not None:
+                return self
+            if not warm_now:
+                self._signatures = {p: _signature(p) for p in self.workbooks + self.models}
+            self._thread = threading.Thread(target=self._run, args=(warm_now,), name="cache-warmer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self, warm_now):
+        if warm_now:
+            self.warm()
+        while not self._stop.wait(self.poll):
+            try:
+                self.check()
+            except Exception:
+                log.exception("Cache warm-up check failed")
+
+
+def preload(script):
+    """Run a dashboard script once outside a session, so its cached startup loads are ready.
+
+    Streamlit keys ``st.cache_resource`` on the function's module, name and
+    source, and runs scripts as ``__main__``; executing the script the same
+    way fills the entries the server's first page view looks up.
+    """
+    t = time.perf_counter()
+    try:
+        with timed("warmup"):
+            runpy.run_path(script, run_name="__main__")
+    except Exception:
+        log.exception("Preloading %s failed; its loads will start on the first page view", script)
+        return
+    log.info("Preloaded %s in %.2fs", script, time.perf_counter() - t)
+
+
+# -------------------------
+# CLI
+# -------------------------
+def build_parser():
+    p = argparse.ArgumentParser(description="Pre-warm the workbook and model caches (optionally keep them fresh).")
+    p.add_argument("--workbook", action="append", help=f"workbook to cache (repeatable, default {DEFAULT_WORKBOOKS})")
+    p.add_argument("--fault-model", action="append")
+    p.add_argument("--etr-model", default=DEFAULT_ETR_MODEL_PATH)
+    p.add_argument("--encoders", default=DEFAULT_ETR_ENCODERS_PATH)
+    p.add_argument("--search-dir", default=DEFAULT_SEARCH_DIR)
+    p.add_argument("--poll", type=float, default=WARMUP_POLL, help="seconds between file checks")
+    p.add_argument("--interval", type=float, default=WARMUP_INTERVAL, help="seconds between full re-warms (0 = off)")
+    p.add_argument("--watch", action="store_true", help="keep running and re-warm files that change")
+    p.add_argument("--serve", metavar="SCRIPT", help="then run this Streamlit script in this process")
+    p.add_argument("streamlit_args", nargs=argparse.REMAINDER, help="extra `streamlit run` arguments (after --serve)")
+    p.add_argument("-q", "--quiet", action="store_true")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format="%(levelname)s %(message)s")
+    warmer = CacheWarmer(args.workbook or DEFAULT_WORKBOOKS, args.fault_model or DEFAULT_FAULT_CANDIDATES,
+                         args.etr_model, args.encoders, search_dir=args.search_dir,
+                         poll=args.poll, interval=args.interval, registry=not args.serve)
+    t = time.perf_counter()
+    for path, s in warmer.warm().items():
+        log.info("  %-28s %-9s %7.2fs%s", path, s["kind"], s["seconds"], f"  ({s['error']})" if s["error"] else "")
+    log.info("Caches warm in %.2fs", time.perf_counter() - t)
+
+    if args.serve:
+        preload(args.serve)
+        from streamlit.web import cli as stcli
+        extra = [a for a in args.streamlit_args if a != "--"]
+        sys.argv = ["streamlit", "run", args.serve, *extra]
+        return stcli.main()
+    if args.watch:
+        warmer.start(warm_now=False)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())